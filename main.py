@@ -10,6 +10,21 @@ from pubsub import pub
 from datetime import datetime
 import queue
 import webbrowser
+import threading
+import concurrent.futures
+import multiprocessing
+import pathlib
+import atexit
+import tempfile
+import collections
+import asyncio
+import functools
+import csv
+import gzip
+import hashlib
+import itertools
+import math
+import random
 
 
 def check_android_permissions(page):
@@ -73,62 +88,474 @@ EXPORT_CSV_FILE = os.path.join(CSV_EXPORT_PATH, f"{CSV_FILENAME}_{timestamp}.csv
 #EXPORT_CSV_FILE = os.path.join("/storage/emulated/0/Download", "exported_results.csv")
 
 
-# Queue for database queries
-db_queue = queue.Queue()
-is_db_processing = False
+# Number of read-only connections kept open for UI queries
+DB_READ_POOL_SIZE = 4
+
+# Maximum number of pending write requests. Producers block for up to
+# DB_WRITE_QUEUE_TIMEOUT seconds when the queue is full before the request fails.
+DB_WRITE_QUEUE_SIZE = 1000
+DB_WRITE_QUEUE_TIMEOUT = 10
+
+
+# Long-lived storage engine: a single writer thread owns a persistent WAL-mode
+# connection and serializes all writes, while reads are served by a small pool
+# of read-only connections so that tab queries never wait behind an ACK insert.
+class StorageEngine:
+    def __init__(self, filepath, read_pool_size=DB_READ_POOL_SIZE):
+        self.filepath = filepath
+        self.read_pool_size = read_pool_size
+        self.write_queue = queue.Queue(maxsize=DB_WRITE_QUEUE_SIZE)
+        self.writer_thread = None
+        self.writer_conn = None
+        self.read_pool = queue.Queue()
+        self.read_connections = 0
+        self.generation = 0
+        self.completed_writes = 0
+        self.rejected_writes = 0
+        self.lock = threading.Lock()
+        self.close_hooks = []
+
+    # func() is called by close(), for connections opened outside the pool
+    def add_close_hook(self, func):
+        self.close_hooks.append(func)
+
+    # Starts the writer thread on first use (and again after close())
+    def ensure_writer(self):
+        with self.lock:
+            self.start_writer_locked()
+
+    def start_writer_locked(self):
+        if self.writer_thread is None or not self.writer_thread.is_alive():
+            self.writer_thread = threading.Thread(target=self.writer_loop, name="db-writer", daemon=True)
+            self.writer_thread.start()
+
+    def open_writer_connection(self):
+        conn = sqlite3.connect(self.filepath, check_same_thread=False, cached_statements=256)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        register_sql_functions(conn)
+        return conn
+
+    def open_reader_connection(self):
+        uri = pathlib.Path(self.filepath).absolute().as_uri() + "?mode=ro"
+        return sqlite3.connect(uri, uri=True, check_same_thread=False, cached_statements=256)
+
+    # Worker loop of the writer thread: takes one request at a time until the
+    # stop marker (None) is read
+    def writer_loop(self):
+        while True:
+            item = self.write_queue.get()
+            if item is None:
+                break
+            future, func = item
+            self.run_request(future, func)
+
+        if self.writer_conn is not None:
+            self.writer_conn.close()
+            self.writer_conn = None
+
+    def run_request(self, future, func):
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            if self.writer_conn is None:
+                self.writer_conn = self.open_writer_connection()
+            future.set_result(func(self.writer_conn))
+        except Exception as e:
+            future.set_exception(e)
+        self.completed_writes += 1
+
+    # Runs func(connection) on the writer thread and returns a future for its result
+    def submit(self, func):
+        future = concurrent.futures.Future()
+
+        # Requests made by the writer thread itself run inline, waiting on its
+        # own queue would deadlock
+        if threading.current_thread() is self.writer_thread:
+            self.run_request(future, func)
+            return future
+
+        self.ensure_writer()
+        try:
+            self.write_queue.put((future, func), timeout=DB_WRITE_QUEUE_TIMEOUT)
+        except queue.Full:
+            with self.lock:
+                self.rejected_writes += 1
+            future.set_exception(RuntimeError("Database write queue is full"))
+        return future
+
+    def stats(self):
+        return {
+            "pending_writes": self.write_queue.qsize(),
+            "completed_writes": self.completed_writes,
+            "rejected_writes": self.rejected_writes,
+        }
+
+    def acquire_reader(self):
+        try:
+            return self.read_pool.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self.lock:
+            can_open = self.read_connections < self.read_pool_size
+            if can_open:
+                self.read_connections += 1
+        if can_open:
+            try:
+                return self.open_reader_connection()
+            except Exception:
+                with self.lock:
+                    self.read_connections -= 1
+                raise
+        return self.read_pool.get()
+
+    def release_reader(self, conn, generation):
+        # Connections handed out before a close() are not returned to the pool
+        if generation != self.generation:
+            conn.close()
+            return
+        self.read_pool.put(conn)
+
+    # Runs func(connection) on a pooled read-only connection in the calling thread
+    def read(self, func):
+        generation = self.generation
+        conn = self.acquire_reader()
+        try:
+            return func(conn)
+        finally:
+            self.release_reader(conn, generation)
+
+    # Stops the writer thread and closes every open connection. Requests queued
+    # before the call are still executed.
+    def close(self):
+        with self.lock:
+            writer_thread = self.writer_thread
+            if writer_thread is not None and writer_thread.is_alive():
+                self.write_queue.put(None)
+                writer_thread.join()
+            self.writer_thread = None
+            self.generation += 1
+            self.read_connections = 0
+
+            # A request queued behind the stop marker gets a fresh writer thread
+            if not self.write_queue.empty():
+                self.start_writer_locked()
+        while True:
+            try:
+                self.read_pool.get_nowait().close()
+            except queue.Empty:
+                break
+        for hook in self.close_hooks:
+            hook()
+
+
+storage_engine = StorageEngine(DATABASE_FILEPATH)
+atexit.register(storage_engine.close)
+
+
+def is_read_query(query):
+    return query.lstrip().split(None, 1)[0].upper() in ("SELECT", "WITH")
+
+
+def execute_query(conn, query, params, fetchone, fetchall, commit, many=False):
+    cursor = conn.cursor()
+    try:
+        result = None
+        if many:
+            cursor.executemany(query, params)
+        else:
+            cursor.execute(query, params)
+        if fetchone:
+            result = cursor.fetchone()
+        if fetchall:
+            result = cursor.fetchall()
+        if commit:
+            conn.commit()
+        elif conn.in_transaction:
+            # Uncommitted changes are discarded, as with a short-lived connection
+            conn.rollback()
+        return result
+    except Exception:
+        if conn.in_transaction:
+            conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+# Maximum number of read query results kept in the query cache
+QUERY_CACHE_SIZE = 128
+
+
+# LRU cache for read query results. It is cleared when something is written
+# through database_manager, or when PRAGMA data_version on its own connection
+# reports a commit from any other connection.
+class QueryCache:
+    def __init__(self, engine, maxsize=QUERY_CACHE_SIZE):
+        self.engine = engine
+        self.maxsize = maxsize
+        self.entries = collections.OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.generation = 0
+        self.version_conn = None
+        self.engine_generation = None
+        self.data_version = None
+        engine.add_close_hook(self.close)
+
+    # Closes the data version connection, so the database file can be removed
+    def close(self):
+        with self.lock:
+            if self.version_conn is not None:
+                self.version_conn.close()
+            self.version_conn = None
+            self.clear_locked()
+
+    # Clears the cache if the database changed since the last lookup.
+    # Returns False when the data version cannot be read (e.g. no database yet).
+    def check_data_version(self):
+        if self.engine_generation != self.engine.generation:
+            if self.version_conn is not None:
+                self.version_conn.close()
+            self.version_conn = None
+            self.engine_generation = self.engine.generation
+        try:
+            if self.version_conn is None:
+                self.version_conn = self.engine.open_reader_connection()
+            data_version = self.version_conn.execute("PRAGMA data_version").fetchone()[0]
+        except sqlite3.Error:
+            self.clear_locked()
+            self.version_conn = None
+            return False
+        if data_version != self.data_version:
+            self.clear_locked()
+            self.data_version = data_version
+        return True
+
+    def clear_locked(self):
+        self.entries.clear()
+        self.generation += 1
+
+    def invalidate(self):
+        with self.lock:
+            self.clear_locked()
+
+    # Returns (found, result, generation); generation has to be passed to store()
+    def lookup(self, key):
+        with self.lock:
+            if not self.check_data_version():
+                return False, None, None
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return True, self.entries[key], self.generation
+            self.misses += 1
+            return False, None, self.generation
+
+    def store(self, key, result, generation):
+        with self.lock:
+            # Results read before a write finished are not cached
+            if generation is None or generation != self.generation:
+                return
+            self.entries[key] = result
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def stats(self):
+        with self.lock:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self.entries)}
+
+
+query_cache = QueryCache(storage_engine)
+
 
 # Handles all database accesses of any kind
-def database_manager(query, params=(), fetchone=False, fetchall=False, commit=False):
-    global is_db_processing
-    result = None
+# Reads run on a pooled read-only connection and are served from the query
+# cache when possible, everything else is handed to the writer thread.
+# With wait=False a future is returned instead of the result.
+# With many=True, params is a sequence of parameter tuples for executemany.
+def database_manager(query, params=(), fetchone=False, fetchall=False, commit=False, wait=True, many=False):
+    def run(conn):
+        return execute_query(conn, query, params, fetchone, fetchall, commit, many)
+
+    def run_write(conn):
+        try:
+            return run(conn)
+        finally:
+            query_cache.invalidate()
 
-    # Insert request into the queue
-    db_queue.put((query, params, fetchone, fetchall, commit))
+    if not commit and (fetchone or fetchall) and is_read_query(query):
+        future = concurrent.futures.Future()
+        key = (query, tuple(params), fetchone, fetchall)
+        try:
+            found, result, generation = query_cache.lookup(key)
+            if not found:
+                result = storage_engine.read(run)
+                query_cache.store(key, result, generation)
+            # Callers get their own copy of a cached row list
+            future.set_result(list(result) if isinstance(result, list) else result)
+        except Exception as e:
+            future.set_exception(e)
+    else:
+        future = storage_engine.submit(run_write)
 
-    # If no processing is currently running, start it
-    if not is_db_processing:
-        result = process_db_queue()
+    if not wait:
+        return future
+    return database_result(future)
 
-    return result
 
-def process_db_queue():
-    global is_db_processing
-    result = None
+# Blocks until a database future is done, errors are logged and give an empty result
+def database_result(future):
+    try:
+        result = future.result()
+    except Exception as e:
+        print(f"Database error: {e}")
+        result = []
+    return result if result is not None else []
 
-    if not db_queue.empty():
-        is_db_processing = True
-        # Get next request from the queue
-        query, params, fetchone, fetchall, commit = db_queue.get()
 
-        # Performs the actual database operation
-        conn = sqlite3.connect(DATABASE_FILEPATH, check_same_thread=False)
-        cursor = conn.cursor()
+# ACK rows are committed in groups: a batch is flushed when it reaches
+# ACK_BATCH_SIZE rows or ACK_BATCH_INTERVAL seconds after its first row
+ACK_BATCH_SIZE = 50
+ACK_BATCH_INTERVAL = 0.5
+
+
+# Collects rows for one INSERT statement and writes them with executemany in a
+# single transaction on a size-or-time trigger
+class InsertBatcher:
+    def __init__(self, query, batch_size=ACK_BATCH_SIZE, interval=ACK_BATCH_INTERVAL):
+        self.query = query
+        self.batch_size = batch_size
+        self.interval = interval
+        self.rows = []
+        self.first_row_time = None
+        self.condition = threading.Condition()
+        self.flush_thread = None
+        self.last_future = None
+
+    def add(self, params):
+        with self.condition:
+            self.rows.append(params)
+            if self.first_row_time is None:
+                self.first_row_time = time.monotonic()
+            if self.flush_thread is None or not self.flush_thread.is_alive():
+                self.flush_thread = threading.Thread(target=self.flush_loop, name="db-batcher", daemon=True)
+                self.flush_thread.start()
+            self.condition.notify()
+
+    # Takes the pending rows out of the batch and hands them to the writer thread
+    def take_batch(self):
+        rows = self.rows
+        self.rows = []
+        self.first_row_time = None
+        if rows:
+            self.last_future = database_manager(self.query, rows, commit=True, many=True, wait=False)
+        return self.last_future
+
+    def flush_loop(self):
+        while True:
+            with self.condition:
+                while not self.rows:
+                    self.condition.wait()
+                while self.rows and len(self.rows) < self.batch_size:
+                    remaining = self.first_row_time + self.interval - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self.condition.wait(remaining)
+                future = self.take_batch()
+            database_result(future)
+            self.forget(future)
+
+    # Writes all pending rows now and waits until they (and any batch already
+    # handed to the writer) are committed
+    def flush(self):
+        with self.condition:
+            future = self.take_batch()
+        if future is None:
+            return True
         try:
-            cursor.execute(query, params)
-            if fetchone:
-                result = cursor.fetchone()
-            if fetchall:
-                result = cursor.fetchall()
-            if commit:
-                conn.commit()
+            future.result()
+            return True
         except Exception as e:
             print(f"Database error: {e}")
-            result = []
+            return False
         finally:
-            cursor.close()
-            conn.close()
+            self.forget(future)
 
-        # Process the next request
-        is_db_processing = False
-        process_db_queue()  # Repeat until the queue is empty
+    # Drops a batch whose result has been consumed, so a later flush() neither
+    # waits for it nor reports its error again
+    def forget(self, future):
+        with self.condition:
+            if self.last_future is future:
+                self.last_future = None
 
-    return result if result is not None else []
 
-def initialize_database(page):
-    # Check if the database already exists
-    db_exists = os.path.exists(DATABASE_FILEPATH)
+# Inserts one sample, used for ACKs and by insert_samples. The content hash is
+# computed from the node_id, timestamp, rssi, snr, antenna_name and location parameters.
+INSERT_SAMPLE_QUERY = '''
+    INSERT INTO results (antenna_name, url, notes, location, node_name, node_id, connection_type, address, timestamp, rssi, snr, rtt_ms,
+                         channel_utilization, air_util_tx, probe_interval, sample_hash)
+    VALUES (?1, ?2, ?3, ?4, ?5, ?6, ?7, ?8, ?9, ?10, ?11, ?12, ?13, ?14, ?15, sample_hash(?6, ?9, ?10, ?11, ?1, ?4))
+'''
 
-    query = '''
+ack_batcher = InsertBatcher(INSERT_SAMPLE_QUERY)
+atexit.register(ack_batcher.flush)
+
+
+# Columns of the probes table without its id. Every sent probe is stored once
+# its outcome ("acked" or "timeout") is known.
+PROBE_COLUMNS = ["antenna_name", "location", "destination", "request_id", "timestamp", "outcome", "rtt_ms"]
+
+INSERT_PROBE_QUERY = f'''
+    INSERT INTO probes ({", ".join(PROBE_COLUMNS)})
+    VALUES ({", ".join("?" for _ in PROBE_COLUMNS)})
+'''
+
+probe_batcher = InsertBatcher(INSERT_PROBE_QUERY)
+atexit.register(probe_batcher.flush)
+
+
+# Columns of the results table, in table order
+RESULT_COLUMNS = ["id", "antenna_name", "url", "notes", "location", "node_name", "node_id", "connection_type", "address", "timestamp", "rssi", "snr", "rtt_ms",
+                  "channel_utilization", "air_util_tx", "probe_interval"]
+
+# Columns of the results table that hold numbers
+NUMERIC_RESULT_COLUMNS = ("id", "rssi", "snr", "rtt_ms", "channel_utilization", "air_util_tx", "probe_interval")
+
+# Columns of a sample without its database id
+SAMPLE_COLUMNS = [column for column in RESULT_COLUMNS if column != "id"]
+
+# The same sample imported twice (e.g. from two exports of one tester) has the
+# same content hash over these columns
+SAMPLE_HASH_COLUMNS = ["node_id", "timestamp", "rssi", "snr", "antenna_name", "location"]
+
+
+def compute_sample_hash(node_id, timestamp, rssi, snr, antenna_name, location):
+    # Numbers are normalized, so 6 and 6.0 give the same hash for a REAL column
+    try:
+        rssi = int(rssi) if rssi is not None else None
+        snr = float(snr) if snr is not None else None
+    except (TypeError, ValueError):
+        pass
+    values = (node_id, timestamp, rssi, snr, antenna_name, location)
+    text = "\x1f".join("" if value is None else str(value) for value in values)
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+# Makes compute_sample_hash available as sample_hash() and rtt_bucket as
+# rtt_bucket() in SQL
+def register_sql_functions(conn):
+    conn.create_function("sample_hash", len(SAMPLE_HASH_COLUMNS), compute_sample_hash, deterministic=True)
+    conn.create_function("rtt_bucket", 1, rtt_bucket, deterministic=True)
+
+# Schema migrations, applied in order. PRAGMA user_version stores the number of
+# migrations already applied to a database file.
+SCHEMA_MIGRATIONS = [
+    # 1: results table
+    ['''
         CREATE TABLE IF NOT EXISTS results (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             antenna_name TEXT,
@@ -143,8 +570,601 @@ def initialize_database(page):
             rssi INTEGER,
             snr REAL
         )
-    '''
-    database_manager(query, commit=True)
+    '''],
+    # 2: location filter, per-location min/max/avg and location deletes
+    ["CREATE INDEX IF NOT EXISTS idx_results_location_antenna ON results (location, antenna_name, rssi, snr)"],
+    # 3: antenna lookups and antenna deletes
+    ["CREATE INDEX IF NOT EXISTS idx_results_antenna_location ON results (antenna_name, location)"],
+    # 4: content hash for duplicate detection when merging datasets
+    [
+        "ALTER TABLE results ADD COLUMN sample_hash TEXT",
+        f"UPDATE results SET sample_hash = sample_hash({', '.join(SAMPLE_HASH_COLUMNS)})",
+        "CREATE INDEX IF NOT EXISTS idx_results_sample_hash ON results (sample_hash)",
+    ],
+    # 5: ACK round-trip time and its histograms per antenna and location
+    [
+        "ALTER TABLE results ADD COLUMN rtt_ms REAL",
+        '''
+            CREATE TABLE IF NOT EXISTS rtt_histograms (
+                antenna_name TEXT,
+                location TEXT,
+                bucket INTEGER,
+                count INTEGER NOT NULL,
+                PRIMARY KEY (antenna_name, location, bucket)
+            )
+        ''',
+    ],
+    # 6: probe outcomes and the sent/acked counters per antenna and location
+    # they keep up to date, for the packet delivery ratio (PDR)
+    [
+        '''
+            CREATE TABLE IF NOT EXISTS probes (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                antenna_name TEXT,
+                location TEXT,
+                destination TEXT,
+                request_id INTEGER,
+                timestamp TEXT,
+                outcome TEXT,
+                rtt_ms REAL
+            )
+        ''',
+        "CREATE INDEX IF NOT EXISTS idx_probes_antenna_location ON probes (antenna_name, location)",
+        '''
+            CREATE TABLE IF NOT EXISTS delivery_stats (
+                antenna_name TEXT,
+                location TEXT,
+                sent INTEGER NOT NULL,
+                acked INTEGER NOT NULL,
+                PRIMARY KEY (antenna_name, location)
+            )
+        ''',
+        '''
+            CREATE TRIGGER IF NOT EXISTS probes_count_insert AFTER INSERT ON probes BEGIN
+                INSERT INTO delivery_stats (antenna_name, location, sent, acked)
+                VALUES (NEW.antenna_name, NEW.location, 1, NEW.outcome = 'acked')
+                ON CONFLICT (antenna_name, location) DO UPDATE SET sent = sent + 1, acked = acked + excluded.acked;
+            END
+        ''',
+        '''
+            CREATE TRIGGER IF NOT EXISTS probes_count_delete AFTER DELETE ON probes BEGIN
+                UPDATE delivery_stats SET sent = sent - 1, acked = acked - (OLD.outcome = 'acked')
+                WHERE antenna_name IS OLD.antenna_name AND location IS OLD.location;
+                DELETE FROM delivery_stats WHERE sent <= 0;
+            END
+        ''',
+    ],
+    # 7: destination node of the RTT histograms and delivery counters, so
+    # antennas can be scored per destination node
+    [
+        "CREATE INDEX IF NOT EXISTS idx_results_node_id ON results (node_id, antenna_name)",
+        '''
+            CREATE TABLE rtt_histograms_by_destination (
+                antenna_name TEXT,
+                location TEXT,
+                destination TEXT,
+                bucket INTEGER,
+                count INTEGER NOT NULL,
+                PRIMARY KEY (antenna_name, location, destination, bucket)
+            )
+        ''',
+        '''
+            INSERT INTO rtt_histograms_by_destination (antenna_name, location, destination, bucket, count)
+            SELECT antenna_name, location, node_id, rtt_bucket(rtt_ms), COUNT(*)
+            FROM results WHERE rtt_ms IS NOT NULL
+            GROUP BY antenna_name, location, node_id, rtt_bucket(rtt_ms)
+        ''',
+        "DROP TABLE rtt_histograms",
+        "ALTER TABLE rtt_histograms_by_destination RENAME TO rtt_histograms",
+        "DROP TRIGGER probes_count_insert",
+        "DROP TRIGGER probes_count_delete",
+        '''
+            CREATE TABLE delivery_stats_by_destination (
+                antenna_name TEXT,
+                location TEXT,
+                destination TEXT,
+                sent INTEGER NOT NULL,
+                acked INTEGER NOT NULL,
+                PRIMARY KEY (antenna_name, location, destination)
+            )
+        ''',
+        '''
+            INSERT INTO delivery_stats_by_destination (antenna_name, location, destination, sent, acked)
+            SELECT antenna_name, location, destination, COUNT(*), SUM(outcome = 'acked')
+            FROM probes GROUP BY antenna_name, location, destination
+        ''',
+        "DROP TABLE delivery_stats",
+        "ALTER TABLE delivery_stats_by_destination RENAME TO delivery_stats",
+        '''
+            CREATE TRIGGER probes_count_insert AFTER INSERT ON probes BEGIN
+                INSERT INTO delivery_stats (antenna_name, location, destination, sent, acked)
+                VALUES (NEW.antenna_name, NEW.location, NEW.destination, 1, NEW.outcome = 'acked')
+                ON CONFLICT (antenna_name, location, destination) DO UPDATE SET sent = sent + 1, acked = acked + excluded.acked;
+            END
+        ''',
+        '''
+            CREATE TRIGGER probes_count_delete AFTER DELETE ON probes BEGIN
+                UPDATE delivery_stats SET sent = sent - 1, acked = acked - (OLD.outcome = 'acked')
+                WHERE antenna_name IS OLD.antenna_name AND location IS OLD.location AND destination IS OLD.destination;
+                DELETE FROM delivery_stats WHERE sent <= 0;
+            END
+        ''',
+    ],
+    # 8: channel load and probe interval at the time of a sample
+    [
+        "ALTER TABLE results ADD COLUMN channel_utilization REAL",
+        "ALTER TABLE results ADD COLUMN air_util_tx REAL",
+        "ALTER TABLE results ADD COLUMN probe_interval REAL",
+    ],
+]
+
+
+# Upgrades a database to the current schema, each migration in its own transaction
+def migrate_database(conn):
+    register_sql_functions(conn)
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    for number in range(version + 1, len(SCHEMA_MIGRATIONS) + 1):
+        conn.execute("BEGIN")
+        try:
+            for statement in SCHEMA_MIGRATIONS[number - 1]:
+                conn.execute(statement)
+            conn.execute(f"PRAGMA user_version = {number}")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    return max(version, len(SCHEMA_MIGRATIONS))
+
+
+# Copies an external database into a temporary file next to the app database
+# and upgrades the copy, so an import never modifies the user's file
+def prepare_import_source(filepath):
+    fd, temp_path = tempfile.mkstemp(suffix=".db", dir=DATABASE_PATH)
+    os.close(fd)
+    try:
+        source = sqlite3.connect(pathlib.Path(filepath).absolute().as_uri() + "?mode=ro", uri=True)
+        target = sqlite3.connect(temp_path)
+        try:
+            source.backup(target)
+            migrate_database(target)
+        finally:
+            source.close()
+            target.close()
+    except Exception:
+        os.remove(temp_path)
+        raise
+    return temp_path
+
+
+# "replace" deletes the existing results before importing and keeps the ids of
+# the imported rows. "merge" keeps the existing results, gives imported rows new
+# ids and skips rows whose content hash is already present.
+IMPORT_MODES = ("replace", "merge")
+
+
+# Imports the results of another database file with ATTACH and INSERT ... SELECT
+# in a single transaction on the writer connection.
+# Returns the number of imported rows.
+def import_results_database(filepath, mode="replace"):
+    if mode not in IMPORT_MODES:
+        raise ValueError(f"Unknown import mode: {mode}")
+
+    columns = ", ".join(RESULT_COLUMNS + ["sample_hash"])
+    data_columns = ", ".join(SAMPLE_COLUMNS + ["sample_hash"])
+    probe_columns = ", ".join(PROBE_COLUMNS)
+
+    def run_import(conn):
+        conn.execute("ATTACH DATABASE ? AS import_source", (import_path,))
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                if mode == "replace":
+                    conn.execute("DELETE FROM main.results")
+                    cursor = conn.execute(f"INSERT INTO main.results ({columns}) SELECT {columns} FROM import_source.results")
+                    conn.execute("DELETE FROM main.probes")
+                    conn.execute(f"INSERT INTO main.probes ({probe_columns}) SELECT {probe_columns} FROM import_source.probes")
+                else:
+                    cursor = conn.execute(f'''
+                        INSERT INTO main.results ({data_columns})
+                        SELECT {data_columns} FROM import_source.results s
+                        WHERE s.id IN (SELECT MIN(id) FROM import_source.results GROUP BY sample_hash)
+                          AND NOT EXISTS (SELECT 1 FROM main.results m WHERE m.sample_hash = s.sample_hash)
+                    ''')
+                    # A probe is identified by its destination, packet id and send time
+                    conn.execute(f'''
+                        INSERT INTO main.probes ({probe_columns})
+                        SELECT {probe_columns} FROM import_source.probes s
+                        WHERE NOT EXISTS (
+                            SELECT 1 FROM main.probes m
+                            WHERE m.destination IS s.destination AND m.request_id IS s.request_id AND m.timestamp IS s.timestamp
+                        )
+                    ''')
+                rebuild_rtt_histograms(conn)
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+        finally:
+            conn.execute("DETACH DATABASE import_source")
+            query_cache.invalidate()
+        return cursor.rowcount
+
+    # The file is imported from an upgraded copy, so older schemas are supported
+    import_path = prepare_import_source(filepath)
+    try:
+        return storage_engine.submit(run_import).result()
+    finally:
+        os.remove(import_path)
+
+
+# Samples are inserted in batches of this size when merging files
+MERGE_BATCH_SIZE = 5000
+
+# Inserts a sample (SAMPLE_COLUMNS plus its hash) unless its hash is already present
+MERGE_INSERT_QUERY = f'''
+    INSERT INTO results ({", ".join(SAMPLE_COLUMNS)}, sample_hash)
+    SELECT {", ".join(f"?{number}" for number in range(1, len(SAMPLE_COLUMNS) + 2))}
+    WHERE NOT EXISTS (SELECT 1 FROM results WHERE sample_hash = ?{len(SAMPLE_COLUMNS) + 1})
+'''
+
+# A probe is identified by its destination, packet id and send time
+PROBE_KEY_COLUMNS = ["destination", "request_id", "timestamp"]
+
+# Inserts a probe (PROBE_COLUMNS) unless the same probe is already present
+MERGE_PROBE_QUERY = f'''
+    INSERT INTO probes ({", ".join(PROBE_COLUMNS)})
+    SELECT {", ".join(f"?{number}" for number in range(1, len(PROBE_COLUMNS) + 1))}
+    WHERE NOT EXISTS (
+        SELECT 1 FROM probes
+        WHERE {" AND ".join(f"{column} IS ?{PROBE_COLUMNS.index(column) + 1}" for column in PROBE_KEY_COLUMNS)}
+    )
+'''
+
+
+# Converts one CSV field to the type of its results column. "None" (written by
+# the CSV export for NULL text) and empty numeric fields become NULL, empty
+# text fields stay empty strings as the app stores them.
+def convert_csv_value(column, value):
+    if value is None or value == "None":
+        return None
+    if value == "":
+        return "" if column not in NUMERIC_RESULT_COLUMNS else None
+    if column == "id":
+        return int(value)
+    if column == "rssi":
+        return int(float(value))
+    if column in NUMERIC_RESULT_COLUMNS:
+        return float(value)
+    return value
+
+
+# Streams the rows of an exported results CSV (optionally gzip compressed) as
+# tuples of the given columns, converted to the column types. Rows that cannot be
+# converted raise ValueError, unless on_invalid(line_number, error) is given, in
+# which case they are reported there and skipped.
+def iter_csv_samples(filepath, columns=SAMPLE_COLUMNS, on_invalid=None):
+    opener = gzip.open if filepath.lower().endswith(".gz") else open
+    with opener(filepath, "rt", newline="", encoding="utf-8") as f:
+        reader = csv.DictReader(f)
+        missing = [column for column in SAMPLE_HASH_COLUMNS if column not in (reader.fieldnames or [])]
+        if missing:
+            raise ValueError(f"Not a results CSV, missing columns: {', '.join(missing)}")
+
+        for record in reader:
+            try:
+                row = tuple(convert_csv_value(column, record.get(column)) for column in columns)
+            except ValueError as e:
+                if on_invalid is None:
+                    raise ValueError(f"Line {reader.line_num}: {e}") from e
+                on_invalid(reader.line_num, e)
+                continue
+            yield row
+
+
+# Reads and hashes the samples of one .db or .csv file, without duplicates.
+# Runs in a worker process of merge_sample_files.
+# Returns (samples, probes); CSV files have no probes.
+def read_sample_file(filepath):
+    probes = []
+    if filepath.lower().endswith((".csv", ".csv.gz")):
+        rows = iter_csv_samples(filepath)
+    else:
+        conn = sqlite3.connect(pathlib.Path(filepath).absolute().as_uri() + "?mode=ro", uri=True)
+        try:
+            # Files from older versions lack some columns (e.g. rtt_ms), read as NULL
+            existing = {row[1] for row in conn.execute("PRAGMA table_info(results)")}
+            selected = ", ".join(column if column in existing else "NULL" for column in SAMPLE_COLUMNS)
+            rows = conn.execute(f"SELECT {selected} FROM results").fetchall()
+            # Files from before the probes table have no probe outcomes
+            existing = {row[1] for row in conn.execute("PRAGMA table_info(probes)")}
+            if existing:
+                selected = ", ".join(column if column in existing else "NULL" for column in PROBE_COLUMNS)
+                key_indexes = [PROBE_COLUMNS.index(column) for column in PROBE_KEY_COLUMNS]
+                unique_probes = {}
+                for probe in conn.execute(f"SELECT {selected} FROM probes"):
+                    unique_probes.setdefault(tuple(probe[index] for index in key_indexes), probe)
+                probes = list(unique_probes.values())
+        finally:
+            conn.close()
+
+    hash_indexes = [SAMPLE_COLUMNS.index(column) for column in SAMPLE_HASH_COLUMNS]
+    samples = {}
+    for row in rows:
+        sample_hash = compute_sample_hash(*(row[index] for index in hash_indexes))
+        if sample_hash not in samples:
+            samples[sample_hash] = row + (sample_hash,)
+    return list(samples.values()), probes
+
+
+# Yields the (samples, probes) of every file as soon as it has been read. Files
+# are read in a process pool; on Android, which has no worker processes, and if
+# the pool cannot be started, the remaining files are read in this process.
+# Workers are spawned rather than forked: a fork would copy the database and
+# pipeline threads' locks in whatever state they are in.
+def read_sample_files(filepaths):
+    remaining = list(filepaths)
+    if not (platform.system() == "Linux" and "ANDROID_STORAGE" in os.environ):
+        try:
+            workers = min(len(remaining), os.cpu_count() or 1)
+            mp_context = multiprocessing.get_context("spawn")
+            with concurrent.futures.ProcessPoolExecutor(max_workers=workers, mp_context=mp_context) as executor:
+                futures = {executor.submit(read_sample_file, filepath): filepath for filepath in remaining}
+                for future in concurrent.futures.as_completed(futures):
+                    result = future.result()
+                    remaining.remove(futures[future])
+                    yield result
+        except (OSError, NotImplementedError, ImportError, concurrent.futures.process.BrokenProcessPool):
+            pass
+    for filepath in list(remaining):
+        result = read_sample_file(filepath)
+        remaining.remove(filepath)
+        yield result
+
+
+# Merges samples from several .db and .csv files into the database, with the
+# probe outcomes of the .db files. Samples whose content hash is already present
+# and probes already present are skipped.
+# progress(files_done, file_count) is called after every file.
+# Returns the number of imported rows.
+def merge_sample_files(filepaths, progress=None):
+    def insert_batch(conn, batch, query=MERGE_INSERT_QUERY):
+        try:
+            cursor = conn.executemany(query, batch)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            query_cache.invalidate()
+        return cursor.rowcount
+
+    imported_rows = 0
+    for files_done, (samples, probes) in enumerate(read_sample_files(filepaths), start=1):
+        for start in range(0, len(samples), MERGE_BATCH_SIZE):
+            batch = samples[start:start + MERGE_BATCH_SIZE]
+            imported_rows += storage_engine.submit(functools.partial(insert_batch, batch=batch)).result()
+        for start in range(0, len(probes), MERGE_BATCH_SIZE):
+            batch = probes[start:start + MERGE_BATCH_SIZE]
+            storage_engine.submit(functools.partial(insert_batch, batch=batch, query=MERGE_PROBE_QUERY)).result()
+        if progress:
+            progress(files_done, len(filepaths))
+    storage_engine.submit(rebuild_rtt_histograms_now).result()
+    return imported_rows
+
+
+# Rows per batch when importing a CSV file
+CSV_IMPORT_BATCH_SIZE = 5000
+
+
+# Inserts a CSV row with the given columns into the staging table of the CSV
+# import and computes its content hash
+def csv_stage_query(columns):
+    return f'''
+    INSERT INTO temp.csv_import ({", ".join(columns)}, sample_hash)
+    VALUES ({", ".join(f"?{number}" for number in range(1, len(columns) + 1))},
+            sample_hash({", ".join(f"?{columns.index(column) + 1}" for column in SAMPLE_HASH_COLUMNS)}))
+'''
+
+
+# Imports an exported results CSV (optionally gzip compressed) with constant
+# memory use: rows are streamed from iter_csv_samples into a temporary staging
+# table in batches, then moved into results in a single transaction, so a file
+# that fails halfway leaves the database as it was. The modes are the same as
+# for import_results_database; in "replace" mode the ids from the file are
+# kept, so an export can be restored as it was. Rows that fail validation are
+# skipped and counted.
+# progress(rows_read, rows_per_second) is called after every batch.
+# Returns (rows_imported, rows_skipped, rows_per_second).
+def import_results_csv(filepath, mode="replace", progress=None, batch_size=CSV_IMPORT_BATCH_SIZE):
+    if mode not in IMPORT_MODES:
+        raise ValueError(f"Unknown import mode: {mode}")
+
+    skipped_rows = 0
+
+    def on_invalid(line_number, error):
+        nonlocal skipped_rows
+        skipped_rows += 1
+        print(f"CSV import, line {line_number} skipped: {error}")
+
+    columns = RESULT_COLUMNS if mode == "replace" else SAMPLE_COLUMNS
+    stage_query = csv_stage_query(columns)
+
+    def create_staging_table(conn):
+        conn.execute("DROP TABLE IF EXISTS temp.csv_import")
+        conn.execute(f"CREATE TEMP TABLE csv_import AS SELECT {', '.join(RESULT_COLUMNS)}, sample_hash FROM results WHERE 0")
+        conn.commit()
+
+    def drop_staging_table(conn):
+        conn.execute("DROP TABLE IF EXISTS temp.csv_import")
+        conn.commit()
+
+    def stage_batch(conn, batch):
+        try:
+            cursor = conn.executemany(stage_query, batch)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        return cursor.rowcount
+
+    # Moves the staged rows into results, all or nothing
+    def apply_staged_rows(conn):
+        try:
+            if mode == "replace":
+                # A CSV holds no probe outcomes, those of the replaced data go with it
+                conn.execute("DELETE FROM results")
+                conn.execute("DELETE FROM probes")
+                cursor = conn.execute(f'''
+                    INSERT INTO results ({", ".join(RESULT_COLUMNS)}, sample_hash)
+                    SELECT {", ".join(RESULT_COLUMNS)}, sample_hash FROM temp.csv_import ORDER BY rowid
+                ''')
+            else:
+                # The first copy of a sample in the file, if it is not in the database yet
+                cursor = conn.execute(f'''
+                    INSERT INTO results ({", ".join(SAMPLE_COLUMNS)}, sample_hash)
+                    SELECT {", ".join(SAMPLE_COLUMNS)}, sample_hash FROM temp.csv_import s
+                    WHERE s.rowid IN (SELECT MIN(rowid) FROM temp.csv_import GROUP BY sample_hash)
+                      AND NOT EXISTS (SELECT 1 FROM results r WHERE r.sample_hash = s.sample_hash)
+                    ORDER BY s.rowid
+                ''')
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            query_cache.invalidate()
+        return cursor.rowcount
+
+    rows = iter_csv_samples(filepath, columns, on_invalid)
+    start_time = time.monotonic()
+    staged_rows = 0
+    rows_per_second = 0.0
+    storage_engine.submit(create_staging_table).result()
+    try:
+        while True:
+            batch = list(itertools.islice(rows, batch_size))
+            if not batch:
+                break
+            staged_rows += storage_engine.submit(functools.partial(stage_batch, batch=batch)).result()
+            elapsed = time.monotonic() - start_time
+            rows_per_second = staged_rows / elapsed if elapsed > 0 else 0.0
+            if progress:
+                progress(staged_rows, rows_per_second)
+        # Replacing with an empty file still clears the results
+        imported_rows = storage_engine.submit(apply_staged_rows).result()
+    finally:
+        storage_engine.submit(drop_staging_table).result()
+
+    storage_engine.submit(rebuild_rtt_histograms_now).result()
+    return imported_rows, skipped_rows, rows_per_second
+
+
+# Copies the live database to dest_path with the SQLite online backup API from
+# a read-only connection, without loading the file into memory. The copy is
+# made in one step, so it reads one consistent snapshot; in WAL mode the writer
+# thread keeps committing meanwhile.
+# With compact=True a vacuumed snapshot is written with VACUUM INTO instead.
+# progress(copied_pages, total_pages) is called when the copy is done.
+def backup_database(dest_path, compact=False, progress=None):
+    # Neither the backup nor VACUUM INTO may write over an existing file
+    if os.path.exists(dest_path):
+        os.remove(dest_path)
+
+    def on_step(status, remaining, total):
+        if progress:
+            progress(total - remaining, total)
+
+    def run_backup(conn):
+        if compact:
+            conn.execute("VACUUM INTO ?", (dest_path,))
+            if progress:
+                progress(1, 1)
+        else:
+            target = sqlite3.connect(dest_path)
+            try:
+                conn.backup(target, pages=-1, progress=on_step)
+            finally:
+                target.close()
+
+        # The copy is a standalone file, so it should not stay in WAL mode
+        target = sqlite3.connect(dest_path)
+        try:
+            target.execute("PRAGMA journal_mode=DELETE")
+        finally:
+            target.close()
+
+    storage_engine.read(run_backup)
+
+
+# Rows fetched per round trip when streaming results out of the database
+EXPORT_CHUNK_SIZE = 1000
+
+
+# Builds a WHERE clause for the optional location/antenna filters of an export
+def results_filter(location=None, antenna_name=None):
+    conditions = []
+    params = []
+    if location and location != "All Locations":
+        conditions.append("location = ?")
+        params.append(location)
+    if antenna_name:
+        conditions.append("antenna_name = ?")
+        params.append(antenna_name)
+    where = (" WHERE " + " AND ".join(conditions)) if conditions else ""
+    return where, params
+
+
+# Streams results into a CSV file chunk by chunk, so memory use stays flat no
+# matter how large the database is. The file is gzip compressed if compress is
+# set. progress(rows_written, total_rows) is called after every chunk.
+# Returns the number of rows written.
+def export_results_csv(filepath, columns=None, location=None, antenna_name=None, compress=False, progress=None, chunk_size=EXPORT_CHUNK_SIZE):
+    columns = list(columns or RESULT_COLUMNS)
+    unknown = [column for column in columns if column not in RESULT_COLUMNS]
+    if unknown:
+        raise ValueError(f"Unknown columns: {', '.join(unknown)}")
+    where, params = results_filter(location, antenna_name)
+    # NULL text is written as "None", so it does not come back as an empty string
+    null_text_indexes = [index for index, column in enumerate(columns) if column not in NUMERIC_RESULT_COLUMNS]
+
+    def export(conn):
+        # One read transaction, so the row count and the rows come from the same snapshot
+        conn.execute("BEGIN")
+        try:
+            total = conn.execute(f"SELECT COUNT(*) FROM results{where}", params).fetchone()[0]
+            cursor = conn.execute(f"SELECT {', '.join(columns)} FROM results{where} ORDER BY id", params)
+            opener = gzip.open if compress else open
+            written = 0
+            with opener(filepath, "wt", newline="", encoding="utf-8") as f:
+                writer = csv.writer(f)
+                writer.writerow(columns)
+                while True:
+                    rows = cursor.fetchmany(chunk_size)
+                    if not rows:
+                        break
+                    if null_text_indexes:
+                        rows = [list(row) for row in rows]
+                        for row in rows:
+                            for index in null_text_indexes:
+                                if row[index] is None:
+                                    row[index] = "None"
+                    writer.writerows(rows)
+                    written += len(rows)
+                    if progress:
+                        progress(written, total)
+            return written
+        finally:
+            conn.rollback()
+
+    return storage_engine.read(export)
+
+
+def initialize_database(page):
+    # Check if the database already exists
+    db_exists = os.path.exists(DATABASE_FILEPATH)
+
+    # Creates the schema or upgrades an existing database in place
+    storage_engine.submit(migrate_database).result()
 
     # After the query, check again if the database now exists
     if os.path.exists(DATABASE_FILEPATH) and not db_exists:
@@ -164,17 +1184,751 @@ def initialize_database(page):
 
 
 
-# Global variables for storing sent message ID and test start time
-sent_message_id = None
+# Global variables for storing the test start time
 test_start_time = None
 test_running = False
 settings_saved = False  # This variable checks if the settings have been saved
 stop_sending = False
+paused_for_reconnect = False  # The test was paused because a radio lost its connection
 
 # Global variables for message and ACK count
 messages_sent = 0
 acks_received = 0
-ack_queue = queue.Queue()  # Queue for processing ACKs
+probes_lost = 0
+test_scheduler = None  # TestScheduler of the running test
+rate_controller = None  # AimdRateController of the running test
+connection_lock = threading.Lock()  # The warm-up and the test start never open the radios at the same time
+
+# Seconds an ACK is waited for before a probe counts as lost
+PROBE_TIMEOUT = 120
+# Resolution of the probe timeout wheel in seconds
+PROBE_TIMEOUT_TICK = 1.0
+
+
+# Probes that are waiting for their ACK, keyed by request (packet) id, so an
+# ACK for any outstanding probe is matched in O(1) and several probes can be in
+# flight at once. Deadlines are kept in a timeout wheel: one bucket per tick,
+# and expire() only looks at the buckets of the ticks that have passed.
+class InFlightTable:
+    def __init__(self, timeout=PROBE_TIMEOUT, tick=PROBE_TIMEOUT_TICK):
+        self.timeout = timeout
+        self.tick = tick
+        self.slot_count = int(math.ceil(timeout / tick)) + 1
+        self.lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        with self.lock:
+            self.probes = {}
+            self.wheel = [set() for _ in range(self.slot_count)]
+            self.current_tick = int(time.monotonic() // self.tick)
+
+    def __len__(self):
+        return len(self.probes)
+
+    # Records a sent probe and returns its record. Extra keyword arguments
+    # (e.g. the antenna and location under test) are kept in the record.
+    def add(self, request_id, destination, attempt=1, sent_at=None, **fields):
+        sent_at = time.monotonic() if sent_at is None else sent_at
+        deadline_tick = int(math.ceil((sent_at + self.timeout) / self.tick))
+        probe = dict(fields)
+        probe.update({
+            'request_id': request_id,
+            'destination': destination,
+            'attempt': attempt,
+            'sent_at': sent_at,
+            'deadline_tick': deadline_tick,
+        })
+        with self.lock:
+            self.probes[request_id] = probe
+            self.wheel[deadline_tick % self.slot_count].add(request_id)
+        return probe
+
+    # Removes and returns the probe an ACK belongs to, or None if the ACK is for
+    # an unknown or expired probe or comes from another node
+    def match(self, request_id, from_id):
+        with self.lock:
+            probe = self.probes.get(request_id)
+            if probe is None or probe['destination'] != from_id:
+                return None
+            del self.probes[request_id]
+            self.wheel[probe['deadline_tick'] % self.slot_count].discard(request_id)
+            return probe
+
+    # Removes and returns the probes whose ACK timeout has passed
+    def expire(self, now=None):
+        now_tick = int((time.monotonic() if now is None else now) // self.tick)
+        expired = []
+        with self.lock:
+            # After a long gap one full turn of the wheel covers every bucket
+            self.current_tick = max(self.current_tick, now_tick - self.slot_count)
+            while self.current_tick < now_tick:
+                self.current_tick += 1
+                bucket = self.wheel[self.current_tick % self.slot_count]
+                for request_id in list(bucket):
+                    probe = self.probes[request_id]
+                    if probe['deadline_tick'] <= now_tick:
+                        bucket.discard(request_id)
+                        del self.probes[request_id]
+                        expired.append(probe)
+        return expired
+
+
+inflight_probes = InFlightTable()
+
+
+# Capacity of each queue between the stages of the ACK pipeline
+ACK_QUEUE_SIZE = 1000
+# Minimum seconds between two UI refreshes for ACKs, a burst is shown at once
+ACK_DISPLAY_INTERVAL = 0.25
+
+
+# Bounded queue between two pipeline stages. put() never blocks the producer:
+# items that do not fit are dropped and counted, peak is the deepest backlog.
+class StageQueue:
+    def __init__(self, maxsize=ACK_QUEUE_SIZE):
+        self.queue = queue.Queue(maxsize)
+        self.dropped = 0
+        self.peak = 0
+
+    def put(self, item):
+        try:
+            self.queue.put_nowait(item)
+        except queue.Full:
+            self.dropped += 1
+            return False
+        self.peak = max(self.peak, self.queue.qsize())
+        return True
+
+    # Blocks for the first item, then takes whatever else is already waiting
+    def get_batch(self, max_items=ACK_BATCH_SIZE):
+        batch = [self.queue.get()]
+        while len(batch) < max_items:
+            try:
+                batch.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def task_done(self, count):
+        for _ in range(count):
+            self.queue.task_done()
+
+
+# ACKs go through three stages, so the meshtastic reader thread never waits
+# for the database or the UI: the receive callback only puts them into the
+# capture queue, the storage thread writes them in batches and passes them on
+# to the display queue, and the display thread refreshes the UI.
+# store(batch) and display(batch) are called with lists of ACKs.
+class AckPipeline:
+    def __init__(self, store, display, maxsize=ACK_QUEUE_SIZE, display_interval=ACK_DISPLAY_INTERVAL):
+        self.store = store
+        self.display = display
+        self.display_interval = display_interval
+        self.capture_queue = StageQueue(maxsize)
+        self.display_queue = StageQueue(maxsize)
+        threading.Thread(target=self.run_storage, name="ack-storage", daemon=True).start()
+        threading.Thread(target=self.run_display, name="ack-display", daemon=True).start()
+
+    # Called on the reader thread, returns False if the ACK was dropped
+    def put(self, ack):
+        return self.capture_queue.put(ack)
+
+    # Waits until every ACK put so far has been stored
+    def drain(self):
+        self.capture_queue.queue.join()
+
+    def run_storage(self):
+        while True:
+            batch = self.capture_queue.get_batch()
+            try:
+                self.store(batch)
+            except Exception as e:
+                print(f"Error while storing ACKs: {e}")
+            for ack in batch:
+                self.display_queue.put(ack)
+            self.capture_queue.task_done(len(batch))
+
+    def run_display(self):
+        while True:
+            batch = self.display_queue.get_batch(ACK_QUEUE_SIZE)
+            try:
+                self.display(batch)
+            except Exception as e:
+                print(f"Error while displaying ACKs: {e}")
+            self.display_queue.task_done(len(batch))
+            time.sleep(self.display_interval)
+
+
+# How a test with several destination nodes probes them: one destination per
+# interval in turn, or all destinations every interval
+DESTINATION_MODES = ("Round robin", "Concurrent")
+
+
+# Splits the Destination Node ID setting (one or more node IDs separated by
+# commas or spaces) into IDs with a single leading "!", without duplicates
+def parse_destination_ids(text):
+    destinations = []
+    for part in (text or "").replace(",", " ").split():
+        node_id = "!" + part.lstrip("!")
+        if node_id != "!" and node_id not in destinations:
+            destinations.append(node_id)
+    return destinations
+
+
+# Parses the additional interfaces of an A/B test, one per line as
+# "antenna name; TCP or BLE; IP address or BLE device". Returns
+# (antenna_name, connection_type, address) tuples; raises ValueError for a
+# line that does not match.
+def parse_interface_specs(text):
+    specs = []
+    for line_number, line in enumerate((text or "").splitlines(), start=1):
+        if not line.strip():
+            continue
+        parts = [part.strip() for part in line.split(";")]
+        if len(parts) != 3 or not all(parts):
+            raise ValueError(f"Line {line_number}: expected 'antenna name; TCP or BLE; address'")
+        antenna_name, connection_type, address = parts
+        connection_type = connection_type.upper()
+        if connection_type not in ("TCP", "BLE"):
+            raise ValueError(f"Line {line_number}: unknown connection type {parts[1]}")
+        specs.append((antenna_name, connection_type, address))
+    return specs
+
+
+# Seconds to wait for the radios to be ready before a test is cancelled
+CONNECTION_READY_TIMEOUT = 30
+
+# Delay before the first reconnect attempt after a lost connection, doubled
+# for every failed attempt up to RECONNECT_MAX_DELAY seconds
+RECONNECT_BASE_DELAY = 2
+RECONNECT_MAX_DELAY = 120
+
+
+# Exponential backoff with jitter, so radios that dropped at the same time do
+# not retry in lockstep
+def reconnect_delay(attempt):
+    return min(RECONNECT_MAX_DELAY, RECONNECT_BASE_DELAY * 2 ** attempt) * random.uniform(0.5, 1.0)
+
+
+# One radio of a test: a TCP or BLE interface bound to the antenna under test
+# on that radio. Its meshtastic.receive listener only passes on packets that
+# arrived on this interface, together with the session.
+class ProbeSession:
+    def __init__(self, antenna_name, connection_type, address, url="", notes=""):
+        self.antenna_name = antenna_name
+        self.connection_type = connection_type
+        self.address = address
+        self.url = url
+        self.notes = notes
+        self.interface = None
+        self.listener = None
+        # Airtime of one probe and the duty-cycle token bucket of this radio,
+        # set up when the test starts
+        self.probe_airtime = 0.0
+        self.airtime_budget = None
+        # Set by the connection and node DB events, wakes up wait_ready()
+        self.connection_event = threading.Event()
+        self.connection_listeners = []
+        # on_lost(session) is called when the interface reports a lost
+        # connection; lost stays set until the session is reconnected
+        self.on_lost = None
+        self.lost = False
+        self.reconnecting = False
+        self.closed = threading.Event()
+        self.connect_error = None
+
+    # The radio this session talks to, sessions of the same radio can share a connection
+    @property
+    def radio(self):
+        return (self.connection_type, self.address)
+
+    def connect(self, timeout=CONNECTION_READY_TIMEOUT):
+        # Subscribed before connecting, the interface may announce itself while
+        # it is still being constructed
+        def on_established(interface):
+            self.connection_event.set()
+
+        def on_node_updated(node, interface):
+            self.connection_event.set()
+
+        # Also published when an interface is closed, which is ignored as the
+        # session lets go of the interface before closing it
+        def on_connection_lost(interface):
+            if interface is self.interface and not self.lost:
+                self.lost = True
+                if self.on_lost is not None:
+                    self.on_lost(self)
+
+        self.connection_listeners = [
+            (on_established, "meshtastic.connection.established"),
+            (on_node_updated, "meshtastic.node.updated"),
+            (on_connection_lost, "meshtastic.connection.lost"),
+        ]
+        for listener, topic in self.connection_listeners:
+            pub.subscribe(listener, topic)
+        self.open_interface(timeout)
+
+    # Starts connecting on a background thread and returns right away. The
+    # meshtastic interfaces block until the node DB is loaded, so the wait and
+    # its timeout are left to wait_ready(); a failure ends up in connect_error.
+    def open_interface(self, timeout=CONNECTION_READY_TIMEOUT):
+        if self.connection_type not in ("TCP", "BLE"):
+            raise ValueError(f"Unknown connection type: {self.connection_type}")
+        self.connect_error = None
+        if self.connection_type == "TCP":
+            self.interface = meshtastic.tcp_interface.TCPInterface(hostname=self.address, connectNow=False, timeout=timeout)
+        tcp_interface = self.interface
+
+        def run():
+            try:
+                if self.connection_type == "TCP":
+                    tcp_interface.myConnect()
+                    tcp_interface.connect()
+                else:
+                    # BLEInterface always connects in its constructor
+                    interface = meshtastic.ble_interface.BLEInterface(self.address, timeout=timeout)
+                    if self.closed.is_set():
+                        interface.close()
+                    else:
+                        self.interface = interface
+            except Exception as e:
+                self.connect_error = e
+            self.connection_event.set()
+
+        threading.Thread(target=run, name=f"connect-{self.antenna_name}", daemon=True).start()
+
+    # Replaces the interface with a new connection, the listeners stay subscribed
+    def reconnect(self, timeout=CONNECTION_READY_TIMEOUT):
+        interface, self.interface = self.interface, None
+        if interface is not None:
+            try:
+                interface.close()
+            except Exception as e:
+                print(f"Error while closing the lost connection of {self.antenna_name}: {e}")
+        self.open_interface(timeout)
+
+    # on_receive(packet, session) is called for the packets of this interface
+    def subscribe(self, on_receive):
+        def listener(packet, interface):
+            if interface is self.interface:
+                on_receive(packet, self)
+
+        # pubsub only keeps a weak reference to the listener
+        self.listener = listener
+        pub.subscribe(listener, "meshtastic.receive")
+
+    # Ready once the interface is connected, has loaded its own node info and
+    # the node DB holds at least one node
+    def is_ready(self):
+        interface = self.interface
+        if interface is None:
+            return False
+        connected = getattr(interface, "isConnected", None)
+        if connected is not None and not connected.is_set():
+            return False
+        return getattr(interface, "myInfo", None) is not None and bool(getattr(interface, "nodes", None))
+
+    # Waits until the session is ready, returns False on timeout, if the
+    # connection failed (see connect_error) or if stopped() becomes true
+    def wait_ready(self, timeout=CONNECTION_READY_TIMEOUT, stopped=None):
+        deadline = time.monotonic() + timeout
+        while not self.is_ready():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or self.connect_error is not None or (stopped is not None and stopped()):
+                return False
+            # Also polled, the events only speed up the check
+            self.connection_event.wait(min(remaining, 0.5))
+            self.connection_event.clear()
+        return True
+
+    def close(self):
+        self.closed.set()
+        for listener, topic in self.connection_listeners:
+            pub.unsubscribe(listener, topic)
+        self.connection_listeners = []
+        if self.listener is not None:
+            pub.unsubscribe(self.listener, "meshtastic.receive")
+            self.listener = None
+        if self.interface is not None:
+            interface, self.interface = self.interface, None
+            interface.close()
+
+
+# Holds the sessions of a test, so several antennas can be compared at the same
+# time on their own radios
+class SessionManager:
+    def __init__(self):
+        self.sessions = []
+
+    # Starts connecting all sessions, wait_ready() waits for the connections;
+    # if one cannot be set up, the ones already open are closed again.
+    # on_lost(session) is called when a session loses its connection.
+    def open(self, sessions, on_receive, on_lost=None, timeout=CONNECTION_READY_TIMEOUT):
+        self.close()
+        try:
+            for session in sessions:
+                session.on_lost = on_lost
+                session.connect(timeout)
+                session.subscribe(on_receive)
+                self.sessions.append(session)
+        except Exception:
+            for session in sessions:
+                try:
+                    session.close()
+                except Exception as e:
+                    print(f"Error while closing {session.antenna_name}: {e}")
+            self.sessions = []
+            raise
+
+    # Closes all sessions and returns the errors that occurred
+    def close(self):
+        errors = []
+        for session in self.sessions:
+            try:
+                session.close()
+            except Exception as e:
+                errors.append(e)
+        self.sessions = []
+        return errors
+
+    # Keeps the open sessions if they connect the same radios as sessions,
+    # taking over their antenna details; returns False if they must be reopened
+    def reuse(self, sessions):
+        if not self.sessions or [session.radio for session in self.sessions] != [session.radio for session in sessions]:
+            return False
+        for open_session, session in zip(self.sessions, sessions):
+            open_session.antenna_name = session.antenna_name
+            open_session.url = session.url
+            open_session.notes = session.notes
+        return True
+
+    # Reconnects a lost session on a background thread until it is ready again
+    # or closed, waiting reconnect_delay() before every attempt.
+    # on_attempt(session, attempt, error) is called after every attempt, with
+    # error None once the session is ready.
+    def reconnect(self, session, ready_timeout=CONNECTION_READY_TIMEOUT, on_attempt=None):
+        if session.reconnecting:
+            return
+        session.reconnecting = True
+
+        def run():
+            try:
+                for attempt in itertools.count():
+                    if session.closed.wait(reconnect_delay(attempt)):
+                        return
+                    try:
+                        session.reconnect(ready_timeout)
+                        if not session.wait_ready(ready_timeout, session.closed.is_set):
+                            raise session.connect_error or TimeoutError(f"radio not ready within {ready_timeout} seconds")
+                    except Exception as e:
+                        if session.closed.is_set():
+                            return
+                        if on_attempt is not None:
+                            on_attempt(session, attempt + 1, e)
+                        continue
+                    # Lost until the new connection is ready, so nothing is sent
+                    # to it and a test does not resume before
+                    session.lost = False
+                    if session.closed.is_set():
+                        session.close()
+                    elif on_attempt is not None:
+                        on_attempt(session, attempt + 1, None)
+                    return
+            finally:
+                session.reconnecting = False
+
+        threading.Thread(target=run, name=f"reconnect-{session.antenna_name}", daemon=True).start()
+
+    # The sessions in turn, so the radios never transmit at the same time
+    def interleaved(self):
+        return itertools.cycle(list(self.sessions))
+
+    # Waits until every session is ready, within one shared timeout.
+    # progress(ready_sessions, session_count) is called as sessions become ready.
+    def wait_ready(self, timeout=CONNECTION_READY_TIMEOUT, stopped=None, progress=None):
+        deadline = time.monotonic() + timeout
+        for ready_sessions, session in enumerate(self.sessions):
+            if progress:
+                progress(ready_sessions, len(self.sessions))
+            if not session.wait_ready(max(0.0, deadline - time.monotonic()), stopped):
+                return False
+        if progress:
+            progress(len(self.sessions), len(self.sessions))
+        return True
+
+
+session_manager = SessionManager()
+atexit.register(session_manager.close)
+
+
+# Shortest probe interval in seconds, also with a generous airtime budget
+MIN_PROBE_INTERVAL = 5
+
+# Spreading factor, bandwidth (kHz) and coding rate (4/x) of the Meshtastic modem presets
+MODEM_PRESETS = {
+    "LONG_FAST": (11, 250, 5),
+    "LONG_SLOW": (12, 125, 8),
+    "VERY_LONG_SLOW": (12, 62.5, 8),
+    "LONG_MODERATE": (11, 125, 8),
+    "MEDIUM_SLOW": (10, 250, 5),
+    "MEDIUM_FAST": (9, 250, 5),
+    "SHORT_SLOW": (8, 250, 5),
+    "SHORT_FAST": (7, 250, 5),
+    "SHORT_TURBO": (7, 500, 5),
+}
+
+# Duty-cycle limits in percent of the regions that have one, all others are unlimited
+REGION_DUTY_CYCLES = {"EU_433": 10, "EU_868": 10, "UA_433": 10, "UA_868": 1}
+
+# Meshtastic sends a 16 symbol preamble and a 16 byte packet header; the
+# encrypted Data message adds the port number and field headers to the payload
+MESHTASTIC_PREAMBLE_SYMBOLS = 16
+MESHTASTIC_HEADER_BYTES = 16
+MESHTASTIC_DATA_OVERHEAD_BYTES = 6
+
+# Duty-cycle limits are averaged over one hour
+DUTY_CYCLE_WINDOW = 3600
+
+
+# Time on air in seconds of a LoRa packet with an explicit header and CRC
+# (Semtech SX127x datasheet formula)
+def lora_time_on_air(payload_bytes, spreading_factor, bandwidth_khz, coding_rate, preamble_symbols=MESHTASTIC_PREAMBLE_SYMBOLS):
+    symbol_time = 2 ** spreading_factor / (bandwidth_khz * 1000)
+    # Low data rate optimization is used for symbols longer than 16 ms
+    low_data_rate = 1 if symbol_time > 0.016 else 0
+    payload_symbols = 8 + max(math.ceil((8 * payload_bytes - 4 * spreading_factor + 28 + 16) / (4 * (spreading_factor - 2 * low_data_rate))) * coding_rate, 0)
+    return (preamble_symbols + 4.25 + payload_symbols) * symbol_time
+
+
+# Name of an enum field value of a protobuf message, or None
+def enum_name(message, field):
+    try:
+        value = getattr(message, field)
+        return message.DESCRIPTOR.fields_by_name[field].enum_type.values_by_number[value].name
+    except (AttributeError, KeyError):
+        return None
+
+
+# Reads (spreading_factor, bandwidth_khz, coding_rate, region) from the LoRa
+# config of a connected interface. Without a config the LONG_FAST default
+# preset is assumed.
+def radio_lora_settings(interface):
+    try:
+        lora = interface.localNode.localConfig.lora
+    except AttributeError:
+        return MODEM_PRESETS["LONG_FAST"] + (None,)
+    region = enum_name(lora, "region")
+    if getattr(lora, "use_preset", True):
+        preset = enum_name(lora, "modem_preset") or "LONG_FAST"
+        return MODEM_PRESETS.get(preset, MODEM_PRESETS["LONG_FAST"]) + (region,)
+    # Custom settings; the firmware maps the bandwidths 31, 62 and 125 to 31.25, 62.5 and 125 kHz
+    bandwidth = {31: 31.25, 62: 62.5}.get(lora.bandwidth, lora.bandwidth)
+    return (lora.spread_factor, bandwidth, lora.coding_rate, region)
+
+
+# Airtime in seconds of one probe with payload_bytes of message text
+def probe_airtime(interface, payload_bytes=0):
+    spreading_factor, bandwidth_khz, coding_rate, region = radio_lora_settings(interface)
+    packet_bytes = MESHTASTIC_HEADER_BYTES + MESHTASTIC_DATA_OVERHEAD_BYTES + payload_bytes
+    return lora_time_on_air(packet_bytes, spreading_factor, bandwidth_khz, coding_rate)
+
+
+# The fastest interval (whole seconds) at which probes_per_interval probes of
+# the given airtime stay within the duty cycle (0..1)
+def plan_probe_interval(airtime, probes_per_interval=1, duty_cycle=1.0, min_interval=MIN_PROBE_INTERVAL):
+    if duty_cycle >= 1:
+        return min_interval
+    return max(min_interval, math.ceil(airtime * probes_per_interval / duty_cycle))
+
+
+# Channel utilization in percent the rate control keeps below; the firmware
+# itself holds back non-essential traffic above 25 %
+CHANNEL_UTILIZATION_TARGET = 25
+# Additive increase of the probe rate per decision, in probes per minute
+AIMD_RATE_STEP = 0.5
+# Multiplicative decrease of the probe rate on congestion
+AIMD_BACKOFF = 0.5
+# Longest interval the rate control backs off to
+MAX_PROBE_INTERVAL = 600
+
+
+# Reads (channel_utilization, air_util_tx) in percent from the device metrics
+# the radio reports for itself, (None, None) if it has not reported any yet
+def read_device_metrics(interface):
+    try:
+        node = interface.getMyNodeInfo() or {}
+    except Exception:
+        return None, None
+    metrics = node.get("deviceMetrics") or {}
+    return metrics.get("channelUtilization"), metrics.get("airUtilTx")
+
+
+# AIMD control of the probe interval from the channel load telemetry: every
+# new reading raises the probe rate by AIMD_RATE_STEP while the channel
+# utilization is below the target (and the radio's own airtime below
+# air_util_limit), and cuts it by AIMD_BACKOFF otherwise. With enabled=False
+# the readings are only tracked, so they can be stored with the samples.
+class AimdRateController:
+    def __init__(self, interval, min_interval=MIN_PROBE_INTERVAL, max_interval=MAX_PROBE_INTERVAL,
+                 target=CHANNEL_UTILIZATION_TARGET, air_util_limit=None, enabled=True):
+        self.interval = interval
+        self.min_interval = min_interval
+        self.max_interval = max(max_interval, interval)
+        self.target = target
+        self.air_util_limit = air_util_limit
+        self.enabled = enabled
+        self.channel_utilization = None
+        self.air_util_tx = None
+        self.decision = None
+
+    # Takes one decision per new reading; returns the new interval, or None
+    # if the reading is not new or the interval stays the same
+    def update(self, channel_utilization, air_util_tx):
+        if channel_utilization is None or (channel_utilization, air_util_tx) == (self.channel_utilization, self.air_util_tx):
+            return None
+        self.channel_utilization = channel_utilization
+        self.air_util_tx = air_util_tx
+        if not self.enabled:
+            return None
+
+        congested = channel_utilization > self.target or (
+            self.air_util_limit is not None and air_util_tx is not None and air_util_tx > self.air_util_limit)
+        if congested:
+            self.decision = "decrease"
+            interval = self.interval / AIMD_BACKOFF
+        else:
+            self.decision = "increase"
+            interval = 60 / (60 / self.interval + AIMD_RATE_STEP)
+        interval = min(self.max_interval, max(self.min_interval, interval))
+        if interval == self.interval:
+            return None
+        self.interval = interval
+        return interval
+
+
+# Transmit airtime used over a sliding duty-cycle window: a transmission is
+# allowed only while the airtime sent within the last `window` seconds,
+# including it, stays within duty_cycle of the window
+class AirtimeBudget:
+    def __init__(self, duty_cycle, window=DUTY_CYCLE_WINDOW):
+        self.duty_cycle = duty_cycle
+        self.window = window
+        self.capacity = duty_cycle * window
+        self.transmissions = collections.deque()  # (send time, airtime)
+        self.used = 0.0
+        self.lock = threading.Lock()
+
+    # Books airtime seconds, returns False (and books nothing) if the budget
+    # does not allow a transmission right now
+    def consume(self, airtime, now=None):
+        now = time.monotonic() if now is None else now
+        with self.lock:
+            while self.transmissions and self.transmissions[0][0] <= now - self.window:
+                self.used -= self.transmissions.popleft()[1]
+            if self.duty_cycle < 1 and self.used + airtime > self.capacity:
+                return False
+            self.transmissions.append((now, airtime))
+            self.used += airtime
+            return True
+
+
+# Runs a test on its own thread with a monotonic clock. A probe is sent every
+# `interval` seconds of running time, and on_tick(seconds_to_next_send,
+# elapsed_seconds) is called once per second in between. Send times are
+# derived from the start time rather than accumulated sleeps, so the schedule
+# does not drift over long runs. stop() and pause() take effect immediately,
+# set_interval() from the next send on.
+class TestScheduler:
+    def __init__(self, interval, on_send, on_tick=None, on_prepare=None, on_finish=None):
+        self.interval = interval
+        # Running time of the next and the last send
+        self.next_send = 0.0
+        self.last_send = None
+        self.on_send = on_send
+        self.on_tick = on_tick
+        self.on_prepare = on_prepare  # Returns False to cancel the test before the first probe
+        self.on_finish = on_finish
+        self.stop_event = threading.Event()
+        self.wake_event = threading.Event()
+        self.paused = False
+        self.thread = None
+        self.error = None  # Exception that ended the test, if any
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run, name="test-scheduler", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        self.wake_event.set()
+
+    def pause(self):
+        self.paused = True
+        self.wake_event.set()
+
+    def resume(self):
+        self.paused = False
+        self.wake_event.set()
+
+    # Changes the interval; the next probe is due `interval` after the last one
+    def set_interval(self, interval):
+        self.interval = interval
+        if self.last_send is not None:
+            self.next_send = self.last_send + interval
+        self.wake_event.set()
+
+    @property
+    def stopped(self):
+        return self.stop_event.is_set()
+
+    # Waits up to `seconds`, returns False if the test was stopped meanwhile
+    def sleep(self, seconds):
+        return not self.stop_event.wait(seconds)
+
+    def wait(self, timeout=None):
+        self.wake_event.wait(timeout)
+        self.wake_event.clear()
+
+    def run(self):
+        try:
+            if self.on_prepare is not None and not self.on_prepare():
+                return
+
+            start_time = time.monotonic()
+            paused_time = 0.0
+            while not self.stopped:
+                if self.paused:
+                    pause_start = time.monotonic()
+                    while self.paused and not self.stopped:
+                        self.wait()
+                    paused_time += time.monotonic() - pause_start
+                    continue
+
+                # Running time, without the time spent paused
+                elapsed = time.monotonic() - start_time - paused_time
+                if elapsed >= self.next_send:
+                    self.last_send = self.next_send
+                    self.on_send()
+                    self.next_send = self.last_send + self.interval
+                    # Slots missed while a send was blocked are skipped, not sent in a burst
+                    if self.next_send <= elapsed:
+                        self.next_send += (int((elapsed - self.next_send) // self.interval) + 1) * self.interval
+                    continue
+
+                seconds_to_next_send = self.next_send - elapsed
+                if self.on_tick is not None:
+                    self.on_tick(seconds_to_next_send, elapsed)
+                # Wake up at the next full second of running time or at the next send
+                self.wait(min(seconds_to_next_send, 1 - elapsed % 1))
+        except Exception as e:
+            print(f"Test stopped by an error: {e}")
+            self.error = e
+        finally:
+            # However the thread ends, the test counts as stopped
+            self.stop()
+            if self.on_finish is not None:
+                self.on_finish()
 
 
 
@@ -198,157 +1952,348 @@ def on_setting_change(e):
 
 
 
-def get_min_rssi(antenna_name=None, location=None):
-    query = "SELECT MIN(rssi) FROM results WHERE 1=1"
-    params = []
-    
-    if antenna_name:
-        query += " AND antenna_name = ?"
-        params.append(antenna_name)
-    
-    if location and location != "All Locations":
-        query += " AND location = ?"
-        params.append(location)
-    
-    result = database_manager(query, params, fetchone=True)
-    return result[0] if result and result[0] is not None else -120
+# Scales an average RSSI between the min/max RSSI of its location to 1..10
+def rssi_score(avg_rssi, min_rssi, max_rssi):
+    if max_rssi == min_rssi:
+        return 5.0
 
-def get_max_rssi(antenna_name=None, location=None):
-    query = "SELECT MAX(rssi) FROM results WHERE 1=1"
-    params = []
-    
-    if antenna_name:
-        query += " AND antenna_name = ?"
-        params.append(antenna_name)
-    
-    if location and location != "All Locations":
-        query += " AND location = ?"
-        params.append(location)
-    
-    result = database_manager(query, params, fetchone=True)
-    return result[0] if result and result[0] is not None else 0
+    score = (avg_rssi - min_rssi) / (max_rssi - min_rssi) * 9 + 1
+    return max(1.0, min(10.0, round(score, 1)))
 
 
-def get_min_snr(location=None):
-    query = "SELECT MIN(snr) FROM results WHERE 1=1"
-    params = []
-    
-    if location and location != "All Locations":
-        query += " AND location = ?"
-        params.append(location)
-    
-    result = database_manager(query, params, fetchone=True)
-    return result[0] if result and result[0] is not None else -100
+# Weight of the packet delivery ratio in the antenna and location scores
+PDR_SCORE_WEIGHT = 0.3
 
 
-def get_max_snr(location=None):
-    query = "SELECT MAX(snr) FROM results WHERE 1=1"
-    params = []
-    
-    if location and location != "All Locations":
-        query += " AND location = ?"
-        params.append(location)
-    
-    result = database_manager(query, params, fetchone=True)
-    return result[0] if result and result[0] is not None else 100
+# Blends a 1..10 signal score with the packet delivery ratio (0..1), mapped to
+# 1..10 as well. Without probe records the signal score is used as it is.
+def combined_score(signal_score, pdr):
+    if pdr is None:
+        return signal_score
+    pdr_score = 1 + 9 * pdr
+    if signal_score is None:
+        return round(pdr_score, 1)
+    return round((1 - PDR_SCORE_WEIGHT) * signal_score + PDR_SCORE_WEIGHT * pdr_score, 1)
 
 
-def calculate_avg_rssi(antenna_name=None, location=None):
-    query = "SELECT rssi FROM results WHERE 1=1"
+# Builds a WHERE clause for the optional location/destination filters of the
+# statistics; column is the name of the destination column in the table
+def stats_filter(location=None, destination=None, column="destination"):
+    conditions = []
     params = []
-    
-    if antenna_name:
-        query += " AND antenna_name = ?"
-        params.append(antenna_name)
-    
     if location and location != "All Locations":
-        query += " AND location = ?"
+        conditions.append("location = ?")
         params.append(location)
-    
-    rssi_values = [row[0] for row in database_manager(query, params, fetchall=True)]
-    
-    if not rssi_values:
-        #print(f"No RSSI values found for antenna {antenna_name} at location {location}")
-        return 0
-    
-    avg_rssi = sum(rssi_values) / len(rssi_values)
-    #print(f"Avg RSSI for antenna {antenna_name} at location {location}: {avg_rssi}")
-    return avg_rssi
+    if destination and destination != "All Destinations":
+        conditions.append(f"{column} = ?")
+        params.append(destination)
+    where = ("WHERE " + " AND ".join(conditions)) if conditions else ""
+    return where, tuple(params)
+
+
+# Returns {antenna_name: pdr} for a location (or all locations) if by is
+# "antenna_name", or {location: pdr} if by is "location", from the counters
+# the probes table keeps in delivery_stats, optionally for one destination
+def query_delivery_ratios(by="antenna_name", location=None, destination=None):
+    if by not in ("antenna_name", "location"):
+        raise ValueError(f"Unknown grouping: {by}")
+    where, params = stats_filter(location, destination)
+
+    query = f"SELECT {by}, SUM(acked), SUM(sent) FROM delivery_stats {where} GROUP BY {by}"
+    return {key: acked / sent for key, acked, sent in database_manager(query, params, fetchall=True) if sent}
+
+
+# Loads everything the Antennas tab needs with one GROUP BY query and computes
+# the scores from that result set. With a destination, only the samples of that
+# destination node are used, so antennas are scored per destination.
+# Returns (antenna_name, avg_rssi, score, url, notes, samples, pdr) tuples; url
+# and notes come from the latest sample of the antenna. Antennas whose probes
+# were all lost have no RSSI and are scored by their PDR alone.
+def query_antenna_stats(location=None, destination=None):
+    where, params = stats_filter(location, destination, column="node_id")
+
+    query = f'''
+        WITH antenna_stats AS (
+            SELECT antenna_name, AVG(rssi) AS avg_rssi, COUNT(rssi) AS samples, MAX(id) AS last_id,
+                   MIN(MIN(rssi)) OVER () AS min_rssi, MAX(MAX(rssi)) OVER () AS max_rssi
+            FROM results {where}
+            GROUP BY antenna_name
+        )
+        SELECT s.antenna_name, s.avg_rssi, s.samples, r.url, r.notes, s.min_rssi, s.max_rssi
+        FROM antenna_stats s JOIN results r ON r.id = s.last_id
+    '''
 
+    delivery_ratios = query_delivery_ratios("antenna_name", location, destination)
+    rows = []
+    for antenna_name, avg_rssi, samples, url, notes, min_rssi, max_rssi in database_manager(query, params, fetchall=True):
+        # Defaults for antennas without RSSI values
+        avg_rssi = avg_rssi if avg_rssi is not None else 0
+        min_rssi = min_rssi if min_rssi is not None else -120
+        max_rssi = max_rssi if max_rssi is not None else 0
+        pdr = delivery_ratios.pop(antenna_name, None)
+        score = combined_score(rssi_score(avg_rssi, min_rssi, max_rssi), pdr)
+        rows.append((antenna_name, avg_rssi, score, url, notes, samples, pdr))
+    for antenna_name, pdr in delivery_ratios.items():
+        rows.append((antenna_name, None, combined_score(None, pdr), None, None, 0, pdr))
+    return rows
+
+
+# Scales an average SNR between the global min/max SNR to 1..10
+def snr_score(avg_snr, min_snr, max_snr):
+    if max_snr == min_snr:
+        return 5.0
 
+    score = (avg_snr - min_snr) / (max_snr - min_snr) * 9 + 1
+    return max(1.0, min(10.0, round(score, 1)))
 
 
-def calculate_avg_snr(location=None):
-    query = "SELECT snr FROM results WHERE location = ?"
-    params = [location]
-    
-    snr_values = [row[0] for row in database_manager(query, params, fetchall=True)]
-    
-    if not snr_values:
-        return 0
-    
-    avg_snr = sum(snr_values) / len(snr_values)
-    return avg_snr
+# Loads everything the Locations tab needs in one statement: the average SNR
+# per location, the global SNR bounds and the antenna with the best average RSSI.
+# Returns (location, avg_snr, score, best_antenna, pdr) tuples.
+def query_location_stats():
+    query = '''
+        WITH location_stats AS (
+            SELECT location, AVG(snr) AS avg_snr,
+                   MIN(MIN(snr)) OVER () AS min_snr, MAX(MAX(snr)) OVER () AS max_snr
+            FROM results
+            GROUP BY location
+        ),
+        antenna_ranking AS (
+            SELECT location, antenna_name,
+                   ROW_NUMBER() OVER (PARTITION BY location ORDER BY AVG(rssi) DESC) AS rank
+            FROM results
+            GROUP BY location, antenna_name
+        )
+        SELECT l.location, l.avg_snr, l.min_snr, l.max_snr, a.antenna_name
+        FROM location_stats l
+        LEFT JOIN antenna_ranking a ON a.location IS l.location AND a.rank = 1
+    '''
 
+    delivery_ratios = query_delivery_ratios("location")
+    rows = []
+    for location, avg_snr, min_snr, max_snr, best_antenna in database_manager(query, fetchall=True):
+        avg_snr = avg_snr if avg_snr is not None else 0
+        pdr = delivery_ratios.pop(location, None)
+        rows.append((location, avg_snr, combined_score(snr_score(avg_snr, min_snr, max_snr), pdr), best_antenna, pdr))
+    for location, pdr in delivery_ratios.items():
+        rows.append((location, None, combined_score(None, pdr), None, pdr))
+    return rows
+
+
+# Growth factor between the buckets of an RTT histogram; a percentile read from
+# a histogram is within about 5 % of the exact value
+RTT_BUCKET_GROWTH = 1.1
+
+
+def rtt_bucket(rtt_ms):
+    return int(math.floor(math.log(max(rtt_ms, 1.0), RTT_BUCKET_GROWTH)))
+
+
+# Streaming histogram of round-trip times with logarithmic buckets. Percentiles
+# are estimated from the bucket counts, so memory does not grow with the samples.
+class RttHistogram:
+    def __init__(self):
+        self.counts = collections.Counter()
+        self.total = 0
+
+    def add(self, rtt_ms):
+        self.add_bucket(rtt_bucket(rtt_ms))
+
+    def add_bucket(self, bucket, count=1):
+        self.counts[bucket] += count
+        self.total += count
+
+    def merge(self, other):
+        for bucket, count in other.counts.items():
+            self.add_bucket(bucket, count)
+
+    # RTT in ms below which the fraction q (0..1) of the samples lies, or None
+    def percentile(self, q):
+        if not self.total:
+            return None
+        rank = max(1, math.ceil(q * self.total))
+        seen = 0
+        for bucket in sorted(self.counts):
+            seen += self.counts[bucket]
+            if seen >= rank:
+                # Geometric middle of the bucket
+                return RTT_BUCKET_GROWTH ** (bucket + 0.5)
+
+    def percentiles(self):
+        return tuple(self.percentile(q) for q in (0.5, 0.9, 0.99))
+
+
+RTT_HISTOGRAM_UPSERT_QUERY = '''
+    INSERT INTO rtt_histograms (antenna_name, location, destination, bucket, count) VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT (antenna_name, location, destination, bucket) DO UPDATE SET count = count + excluded.count
+'''
+
+
+# RTT histograms of the running test per (antenna_name, location, destination). New samples
+# are also kept as pending bucket counts until flush() adds them to the
+# rtt_histograms table, which the Antennas and Locations tabs read.
+class RttHistograms:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.histograms = {}
+        self.pending = collections.Counter()
+
+    def clear(self):
+        with self.lock:
+            self.histograms = {}
+
+    def add(self, antenna_name, location, destination, rtt_ms):
+        if rtt_ms is None:
+            return
+        with self.lock:
+            self.histograms.setdefault((antenna_name, location, destination), RttHistogram()).add(rtt_ms)
+            self.pending[(antenna_name, location, destination, rtt_bucket(rtt_ms))] += 1
+
+    # All samples of the running test in one histogram
+    def run_histogram(self):
+        histogram = RttHistogram()
+        with self.lock:
+            for run_histogram in self.histograms.values():
+                histogram.merge(run_histogram)
+        return histogram
+
+    def flush(self):
+        with self.lock:
+            rows = [key + (count,) for key, count in self.pending.items()]
+            self.pending = collections.Counter()
+        if rows:
+            database_manager(RTT_HISTOGRAM_UPSERT_QUERY, rows, commit=True, many=True)
+
+
+rtt_histograms = RttHistograms()
+atexit.register(rtt_histograms.flush)
+
+
+# Recomputes the rtt_histograms table from the rtt_ms column, after bulk
+# imports. Runs inside the caller's transaction on the writer connection.
+def rebuild_rtt_histograms(conn):
+    conn.execute("DELETE FROM rtt_histograms")
+    conn.execute('''
+        INSERT INTO rtt_histograms (antenna_name, location, destination, bucket, count)
+        SELECT antenna_name, location, node_id, rtt_bucket(rtt_ms), COUNT(*)
+        FROM results WHERE rtt_ms IS NOT NULL
+        GROUP BY antenna_name, location, node_id, rtt_bucket(rtt_ms)
+    ''')
+
+
+def rebuild_rtt_histograms_now(conn):
+    try:
+        rebuild_rtt_histograms(conn)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        query_cache.invalidate()
 
 
+# Returns {antenna_name: (p50, p90, p99)} for a location (or all locations) if
+# by is "antenna_name", or {location: (p50, p90, p99)} if by is "location",
+# optionally for one destination node only. Percentiles are RTTs in ms.
+def query_rtt_percentiles(by="antenna_name", location=None, destination=None):
+    if by not in ("antenna_name", "location"):
+        raise ValueError(f"Unknown grouping: {by}")
+    where, params = stats_filter(location, destination)
 
-def calculate_rssi_score(antenna_name=None, location=None):
-    avg_rssi = calculate_avg_rssi(antenna_name=antenna_name, location=location)
-    min_rssi = get_min_rssi(location=location)
-    max_rssi = get_max_rssi(location=location)
+    query = f"SELECT {by}, bucket, SUM(count) FROM rtt_histograms {where} GROUP BY {by}, bucket"
+    histograms = {}
+    for key, bucket, count in database_manager(query, params, fetchall=True):
+        histograms.setdefault(key, RttHistogram()).add_bucket(bucket, count)
+    return {key: histogram.percentiles() for key, histogram in histograms.items()}
 
-    if max_rssi == min_rssi:
-        return 5.0
 
-    score = (avg_rssi - min_rssi) / (max_rssi - min_rssi) * 9 + 1
-    return max(1.0, min(10.0, round(score, 1)))
+# "p50 / p90 / p99" in seconds for the tables
+def format_rtt_percentiles(percentiles):
+    if not percentiles or percentiles[0] is None:
+        return "N/A"
+    return " / ".join(f"{value / 1000:.1f}" for value in percentiles) + " s"
 
 
-def calculate_snr_score(location=None):
-    avg_snr = calculate_avg_snr(location=location)
-    
-    result = database_manager("SELECT MIN(snr), MAX(snr) FROM results", fetchone=True)
-    global_min_snr, global_max_snr = result
-    
-    if global_max_snr == global_min_snr:
-        return 5.0
+# Packet delivery ratio as a percentage for the tables
+def format_pdr(pdr):
+    return "N/A" if pdr is None else f"{pdr * 100:.0f}%"
 
-    score = (avg_snr - global_min_snr) / (global_max_snr - global_min_snr) * 9 + 1
-    return max(1.0, min(10.0, round(score, 1)))
+
+
+# Asyncio facade over the storage layer for the flet event handlers. Queries run
+# on a small thread pool, so the event loop stays responsive while they execute.
+class AsyncStorage:
+    def __init__(self, max_workers=2):
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="db-async")
+
+    async def run(self, func, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, functools.partial(func, *args))
+
+    async def fetch_locations(self):
+        rows = await self.run(database_manager, "SELECT DISTINCT location FROM results", (), False, True)
+        return [row[0] for row in rows]
+
+    async def fetch_antenna_stats(self, location=None, destination=None):
+        return await self.run(query_antenna_stats, location, destination)
+
+    # Destination nodes of all samples and probes
+    async def fetch_destinations(self):
+        query = "SELECT node_id FROM results WHERE node_id IS NOT NULL UNION SELECT destination FROM probes WHERE destination IS NOT NULL"
+        rows = await self.run(database_manager, query, (), False, True)
+        return [row[0] for row in rows]
+
+    async def fetch_location_stats(self):
+        return await self.run(query_location_stats)
+
+    # RTT percentiles, including the samples of a running test
+    async def fetch_rtt_percentiles(self, by="antenna_name", location=None, destination=None):
+        await self.run(rtt_histograms.flush)
+        return await self.run(query_rtt_percentiles, by, location, destination)
+
+    # Inserts sample rows (see INSERT_SAMPLE_QUERY) in one transaction on the writer thread
+    async def insert_samples(self, rows):
+        future = database_manager(INSERT_SAMPLE_QUERY, list(rows), commit=True, many=True, wait=False)
+        return await asyncio.wrap_future(future)
+
+
+async_storage = AsyncStorage()
 
 
 
 expanded_row = None
 expanded_row_text_elements = []
 
-def toggle_row(additional_info_row, text_elements, page):
+# additional_info_rows are the detail rows shown below a table row on click
+def toggle_row(additional_info_rows, text_elements, page):
     #print(f"Toggling row for antenna: {text_elements[0].value}")
     global expanded_row, expanded_row_text_elements
 
     # Close previous row
-    if expanded_row and expanded_row != additional_info_row:
-        expanded_row.visible = False
+    if expanded_row and expanded_row != additional_info_rows:
+        for row in expanded_row:
+            row.visible = False
         for text in expanded_row_text_elements:
             text.weight = "normal"
         expanded_row = None
 
     # Toggle visibility of current row
-    is_expanded = not additional_info_row.visible
-    additional_info_row.visible = is_expanded
+    is_expanded = not additional_info_rows[0].visible
+    for row in additional_info_rows:
+        row.visible = is_expanded
 
     # Set the font to bold when the row is visible
     for text in text_elements:
         text.weight = "bold" if is_expanded else "normal"
 
     if is_expanded:
-        expanded_row = additional_info_row
+        expanded_row = additional_info_rows
         expanded_row_text_elements = text_elements
     else:
         expanded_row = None
         expanded_row_text_elements = []
 
-    #print(f"Row visibility: {additional_info_row.visible}")  # Sichtbarkeit überprüfen
+    #print(f"Row visibility: {additional_info_rows[0].visible}")  # Sichtbarkeit überprüfen
 
     page.update()
 
@@ -361,8 +2306,7 @@ def toggle_row(additional_info_row, text_elements, page):
 
 def main(page: ft.Page):
     check_android_permissions(page)
-    global interface, stop_sending, connection_status_icon, connection_status_text, test_start_time, sort_column, sort_descending, min_snr, max_snr, min_rssi, max_rssi
-    interface = None
+    global stop_sending, connection_status_icon, connection_status_text, test_start_time, sort_column, sort_descending, min_snr, max_snr, min_rssi, max_rssi
     sort_column = "score"  # Sort by "score" by default
     sort_descending = True  # Sort in descending order by default
 
@@ -370,8 +2314,34 @@ def main(page: ft.Page):
     def update_message_ack_display():
         messages_sent_value.value = f"{messages_sent}"
         acks_received_value.value = f"{acks_received}"
+        probes_lost_value.value = f"{probes_lost}"
+        # Delivery ratio over the probes of this run whose outcome is known
+        pdr_value.value = format_pdr(acks_received / (acks_received + probes_lost) if acks_received + probes_lost else None)
+        rtt_value.value = format_rtt_percentiles(rtt_histograms.run_histogram().percentiles())
         page.update()
 
+    # Counts probes whose ACK did not arrive within PROBE_TIMEOUT as lost
+    def expire_probes():
+        global probes_lost
+        expired = inflight_probes.expire()
+        for probe in expired:
+            record_probe(probe, "timeout")
+        if expired:
+            probes_lost += len(expired)
+            update_message_ack_display()
+
+    # Stores the outcome of a probe through the probe insert batch
+    def record_probe(probe, outcome, rtt_ms=None):
+        probe_batcher.add((
+            probe.get('antenna_name'),
+            probe.get('location'),
+            probe['destination'],
+            probe['request_id'],
+            probe.get('timestamp'),
+            outcome,
+            rtt_ms,
+        ))
+
     try:
         # Initialize the database (creates the table if necessary)
         initialize_database(page)
@@ -418,15 +2388,28 @@ def main(page: ft.Page):
 
 
 
-    def load_results(location_filter=None):
+    # Counters to drop results of a tab load that was superseded by a newer one
+    load_requests = {"antennas": 0, "locations": 0}
+
+    # Sort key that puts rows without a value (None) at the end of a descending sort
+    def missing_last(value):
+        return (value is not None, value if value is not None else 0)
+
+    async def load_results(location_filter=None):
         # Ensure that the database exists
         if not os.path.exists(DATABASE_FILEPATH):
             page.overlay.append(ft.SnackBar(ft.Text("No database connection."), open=True))
             return
 
+        load_requests["antennas"] += 1
+        request = load_requests["antennas"]
+        antennas_loading_ring.visible = True
+        page.update()
+
         # Load distinct locations from the database
-        location_query = "SELECT DISTINCT location FROM results"
-        locations = ["All Locations"] + [row[0] for row in database_manager(location_query, fetchall=True)]
+        locations = ["All Locations"] + await async_storage.fetch_locations()
+        if request != load_requests["antennas"]:
+            return
         location_filter_dropdown.options = [ft.dropdown.Option(loc) for loc in locations]
 
         # Set default value for location_filter
@@ -435,38 +2418,37 @@ def main(page: ft.Page):
 
         location_filter = location_filter_dropdown.value
 
-        rows = []
-
-        # Create the data query based on the location_filter
-        if location_filter == "All Locations" or location_filter is None:
-            query = '''SELECT id, antenna_name, location, url, notes FROM results GROUP BY antenna_name, location, url, notes'''
-            params = ()
-        else:
-            query = '''SELECT id, antenna_name, location, url, notes FROM results WHERE location = ? GROUP BY antenna_name, location, url, notes'''
-            params = (location_filter,)
-
-        # Retrieve results from the database
-        results = database_manager(query, params, fetchall=True)
-
-        # Calculate avg_rssi and score for each antenna, based on the selected location
-        for result_row in results:
-            avg_rssi = calculate_avg_rssi(antenna_name=result_row[1], location=location_filter)
-            score = calculate_rssi_score(antenna_name=result_row[1], location=location_filter)
-            rows.append((result_row[0], result_row[1], avg_rssi, score, result_row[3], result_row[4]))
+        # Destination nodes, for scores per antenna and destination pair
+        destinations = ["All Destinations"] + await async_storage.fetch_destinations()
+        if request != load_requests["antennas"]:
+            return
+        destination_filter_dropdown.options = [ft.dropdown.Option(node_id) for node_id in destinations]
+        if destination_filter_dropdown.value not in destinations:
+            destination_filter_dropdown.value = "All Destinations"
+        destination_filter = destination_filter_dropdown.value
+
+        # avg_rssi and score for each antenna, based on the selected location and destination
+        rows = await async_storage.fetch_antenna_stats(location_filter, destination_filter)
+        rtt_percentiles = await async_storage.fetch_rtt_percentiles("antenna_name", location_filter, destination_filter)
+        if request != load_requests["antennas"]:
+            return
+        antennas_loading_ring.visible = False
 
         # Sort according to the selected criterion
         if sort_column == "antenna_name":
-            rows = sorted(rows, key=lambda x: x[1], reverse=sort_descending)
+            rows = sorted(rows, key=lambda x: x[0], reverse=sort_descending)
         elif sort_column == "rssi":
-            rows = sorted(rows, key=lambda x: x[2], reverse=sort_descending)
+            rows = sorted(rows, key=lambda x: missing_last(x[1]), reverse=sort_descending)
         elif sort_column == "score":
-            rows = sorted(rows, key=lambda x: x[3], reverse=sort_descending)
+            rows = sorted(rows, key=lambda x: x[2], reverse=sort_descending)
+        elif sort_column == "pdr":
+            rows = sorted(rows, key=lambda x: missing_last(x[6]), reverse=sort_descending)
 
         # Display results in the table
         # Create table rows
         results_table.rows = [
             row for result_rows in rows
-            for row in create_antenna_row(result_rows, page)
+            for row in create_antenna_row(result_rows, page, rtt_percentiles.get(result_rows[0]))
             #if row.visible  # Only visible rows
         ]
         
@@ -481,25 +2463,33 @@ def main(page: ft.Page):
 
 
 
-    def load_locations(sort_by="score"):
-        location_query = "SELECT DISTINCT location FROM results"
-        locations = [row[0] for row in database_manager(location_query, fetchall=True)]
+    async def load_locations(sort_by="score"):
+        load_requests["locations"] += 1
+        request = load_requests["locations"]
+        locations_loading_ring.visible = True
+        page.update()
 
-        rows = []
-        for location in locations:
-            avg_snr = calculate_avg_snr(location=location)
-            score = calculate_snr_score(location=location)
-            rows.append((location, avg_snr, score))
+        # avg_snr, score and best antenna for every location in one query
+        rows = await async_storage.fetch_location_stats()
+        rtt_percentiles = await async_storage.fetch_rtt_percentiles("location")
+        if request != load_requests["locations"]:
+            return
+        locations_loading_ring.visible = False
 
         # Sorting based on the selected column
         if sort_by == "location_name":
             rows = sorted(rows, key=lambda x: x[0], reverse=sort_descending)
         elif sort_by == "snr":
-            rows = sorted(rows, key=lambda x: x[1], reverse=sort_descending)
+            rows = sorted(rows, key=lambda x: missing_last(x[1]), reverse=sort_descending)
         elif sort_by == "score":
             rows = sorted(rows, key=lambda x: x[2], reverse=sort_descending)
+        elif sort_by == "pdr":
+            rows = sorted(rows, key=lambda x: missing_last(x[4]), reverse=sort_descending)
 
-        locations_table.rows = [row for result_rows in rows for row in create_location_row(result_rows, page)]
+        locations_table.rows = [
+            row for result_rows in rows
+            for row in create_location_row(result_rows, page, rtt_percentiles.get(result_rows[0]))
+        ]
         page.update()
 
 
@@ -516,26 +2506,28 @@ def main(page: ft.Page):
 
 
 
-    def create_antenna_row(row, page):
-        antenna_name = row[1]
-        location = location_filter_dropdown.value  # Location from the dropdown filter
+    # rtt_percentiles: (p50, p90, p99) RTT of the antenna in ms, or None
+    def create_antenna_row(row, page, rtt_percentiles=None):
+        antenna_name = row[0]
         #print(f"Row data: {row}")
 
-        # Calculation of avg_rssi and score using the designated functions
-        avg_rssi = calculate_avg_rssi(antenna_name=antenna_name, location=location)
-        score = calculate_rssi_score(antenna_name=antenna_name, location=location)
+        # avg_rssi and score are precomputed by query_antenna_stats
+        avg_rssi = row[1]
+        score = row[2]
 
         avg_rssi_text = "N/A" if avg_rssi is None else str(round(avg_rssi, 2))
         score_text = "N/A" if score is None else str(round(score, 2))
+        pdr_text = format_pdr(row[6])
         
-        url = row[4] if row[4] is not None else ""  # Ensure URL is present
-        notes = row[5] if row[5] not in [None, ""] else "No Notes"
+        url = row[3] if row[3] is not None else ""  # Ensure URL is present
+        notes = row[4] if row[4] not in [None, ""] else "No Notes"
        
         
         # Text elements for the main row
         text_elements = [
             ft.Text(antenna_name, size=12),
             ft.Text(avg_rssi_text, size=12),
+            ft.Text(pdr_text, size=12),
             ft.Text(score_text, size=12)
         ]
         
@@ -549,49 +2541,77 @@ def main(page: ft.Page):
                     ) if url else ft.Text("No Link")
                 ),
                 ft.DataCell(ft.Text("Notes:", weight="bold", size=12)),
-                ft.DataCell(ft.Text(notes))
+                ft.DataCell(ft.Text(notes)),
+                ft.DataCell(ft.Text(""))
             ],
             visible=False  # Temporarily set the row to 'visible'
         )
 
+        # ACK round-trip time percentiles, from the rtt_histograms table
+        rtt_info_row = ft.DataRow(
+            cells=[
+                ft.DataCell(ft.Text("RTT p50/p90/p99:", weight="bold", size=12)),
+                ft.DataCell(ft.Text(format_rtt_percentiles(rtt_percentiles), size=12)),
+                ft.DataCell(ft.Text("")),
+                ft.DataCell(ft.Text(""))
+            ],
+            visible=False
+        )
+
 
         # Main antenna row
         expandable_row = ft.DataRow(
             cells=[
                 ft.DataCell(ft.Container(content=text_elements[0], alignment=ft.alignment.center)),
                 ft.DataCell(ft.Container(content=text_elements[1], alignment=ft.alignment.center)),
-                ft.DataCell(ft.Container(content=text_elements[2], alignment=ft.alignment.center))
+                ft.DataCell(ft.Container(content=text_elements[2], alignment=ft.alignment.center)),
+                ft.DataCell(ft.Container(content=text_elements[3], alignment=ft.alignment.center))
             ],
-            on_select_changed=lambda _: toggle_row(additional_info_row, text_elements, page)
+            on_select_changed=lambda _: toggle_row([additional_info_row, rtt_info_row], text_elements, page)
         )
 
-        return [expandable_row, additional_info_row]
+        return [expandable_row, additional_info_row, rtt_info_row]
     
 
 
 
 
 
-    def create_location_row(row, page):
+    # rtt_percentiles: (p50, p90, p99) RTT of the location in ms, or None
+    def create_location_row(row, page, rtt_percentiles=None):
         location_name = row[0]
-        avg_snr = round(row[1], 2)  # The average SNR for the location
-        score = round(row[2], 2)  # The calculated score based on avg_snr
-        score_text = "N/A" if score is None else str(score)
+        # The average SNR for the location, None if all its probes were lost
+        avg_snr_text = "N/A" if row[1] is None else str(round(row[1], 2))
+        # The calculated score based on avg_snr and PDR, None without scored samples
+        score_text = "N/A" if row[2] is None else str(round(row[2], 2))
+        pdr_text = format_pdr(row[4])
 
         text_elements = [
             ft.Text(location_name, size=12),
-            ft.Text(str(avg_snr), size=12),
+            ft.Text(avg_snr_text, size=12),
+            ft.Text(pdr_text, size=12),
             ft.Text(score_text, size=12)
         ]
 
-        # SQL query to determine the antenna with the best RSSI value for this location
-        best_antenna = database_manager('''SELECT antenna_name, rssi FROM results WHERE location=? ORDER BY rssi DESC LIMIT 1''', (location_name,), fetchone=True)
-        best_antenna_text = best_antenna[0] if best_antenna else "No Antenna Found"
+        # The antenna with the best average RSSI for this location, from query_location_stats
+        best_antenna = row[3]
+        best_antenna_text = best_antenna if best_antenna else "No Antenna Found"
 
         additional_info_row = ft.DataRow(
             cells=[
                 ft.DataCell(ft.Text("Best antenna for this location:", weight="bold", size=12)),
                 ft.DataCell(ft.Text(best_antenna_text, weight="bold", size=12)),
+                ft.DataCell(ft.Text("")),
+                ft.DataCell(ft.Text(""))
+            ],
+            visible=False
+        )
+
+        rtt_info_row = ft.DataRow(
+            cells=[
+                ft.DataCell(ft.Text("RTT p50/p90/p99:", weight="bold", size=12)),
+                ft.DataCell(ft.Text(format_rtt_percentiles(rtt_percentiles), weight="bold", size=12)),
+                ft.DataCell(ft.Text("")),
                 ft.DataCell(ft.Text(""))
             ],
             visible=False
@@ -601,12 +2621,13 @@ def main(page: ft.Page):
             cells=[
                 ft.DataCell(ft.Container(content=text_elements[0], alignment=ft.alignment.center)),  # Centered
                 ft.DataCell(ft.Container(content=text_elements[1], alignment=ft.alignment.center)),  # Centered
-                ft.DataCell(ft.Container(content=text_elements[2], alignment=ft.alignment.center))   # Centered
+                ft.DataCell(ft.Container(content=text_elements[2], alignment=ft.alignment.center)),  # Centered
+                ft.DataCell(ft.Container(content=text_elements[3], alignment=ft.alignment.center))   # Centered
             ],
-            on_select_changed=lambda _: toggle_row(additional_info_row, text_elements, page)
+            on_select_changed=lambda _: toggle_row([additional_info_row, rtt_info_row], text_elements, page)
         )
 
-        return [expandable_row, additional_info_row]
+        return [expandable_row, additional_info_row, rtt_info_row]
     
 
 
@@ -625,19 +2646,35 @@ def main(page: ft.Page):
         global test_start_time
         test_start_time = datetime.now()
 
-    def update_elapsed_time():
-        if test_start_time is not None and not stop_sending:
-            elapsed_time = datetime.now() - test_start_time
-            hours, remainder = divmod(elapsed_time.seconds, 3600)
-            minutes, seconds = divmod(remainder, 60)
-            elapsed_time_label.value = f"Elapsed Time: {hours:02}:{minutes:02}:{seconds:02}"
-            page.update()
+    # Countdown and elapsed time, called once per second by the test scheduler
+    def update_test_clock(seconds_to_next_send, elapsed_seconds):
+        if stop_sending:
+            return
+        expire_probes()
+        countdown_label.value = f"Next message in {math.ceil(seconds_to_next_send)} seconds..."
+        hours, remainder = divmod(int(elapsed_seconds), 3600)
+        minutes, seconds = divmod(remainder, 60)
+        elapsed_time_label.value = f"Elapsed Time: {hours:02}:{minutes:02}:{seconds:02}"
+        page.update()
 
 
 
-    def send_message(destination_node_id):
-        global sent_message_id, messages_sent
+    # Sends a probe over the interface of session (the first session by default)
+    def send_message(destination_node_id, session=None):
+        global messages_sent
         try:
+            session = session or session_manager.sessions[0]
+            interface = session.interface
+            if session.lost:
+                countdown_label.value = "Radio reconnecting, probe skipped"
+                page.update()
+                return
+            if session.airtime_budget is not None and not session.airtime_budget.consume(session.probe_airtime):
+                countdown_label.value = "Airtime budget used up, probe skipped"
+                page.update()
+                return
+            # RTT is measured from here with the monotonic clock
+            sent_at = time.monotonic()
             if visible_message_checkbox.value:
                 sent_message = interface.sendText(
                     text=message_text_input.value,
@@ -651,11 +2688,16 @@ def main(page: ft.Page):
                     wantAck=True
                 )
 
-            # Direct assignment of the ID
-            sent_message_id = sent_message.id
             messages_sent += 1  # Increment message counter
+            # The probe waits in the in-flight table until its ACK arrives or it times out
+            inflight_probes.add(
+                sent_message.id, destination_node_id, attempt=1, sent_at=sent_at,
+                antenna_name=session.antenna_name,
+                location=location_input_dropdown.value if location_input_dropdown.value != "New Location" else new_location_input.value,
+                timestamp=datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            )
             update_message_ack_display()  # Update GUI for sent messages
-            #print(f"Sent message ID: {sent_message_id}")
+            #print(f"Sent message ID: {sent_message.id}")
         except Exception as ex:
             connection_status_text.value = f"Error: {str(ex)}"
             connection_status_icon.color = "red"
@@ -671,19 +2713,25 @@ def main(page: ft.Page):
         global settings_saved
 
         validate_interval(interval_input)
+        validate_ready_timeout(ready_timeout_input)
 
         tcp_ip = tcp_ip_input.value if connection_type_dropdown.value == "TCP" else ""
         ble_device_name = ble_device_input.value if connection_type_dropdown.value == "BLE" else ""
         
-        # Validation of the Destination Node ID
-        destination_node_id = destination_node_input.value.strip()
+        # Validation of the additional A/B test interfaces
+        try:
+            parse_interface_specs(additional_interfaces_input.value)
+        except ValueError as ex:
+            page.overlay.append(ft.SnackBar(ft.Text(f"Additional interfaces: {ex}"), open=True))
+            page.update()
+            return
 
-        # Remove all exclamation marks and then add only one
-        destination_node_id = destination_node_id.lstrip("!")  # Removes all leading exclamation marks
-        destination_node_id = "!" + destination_node_id  # Adds a single exclamation mark
+        # Validation of the Destination Node IDs, each gets a single leading exclamation mark
+        destination_node_id = ", ".join(parse_destination_ids(destination_node_input.value))
 
-        # Update the input field with the correct Destination Node ID
+        # Update the input field with the correct Destination Node IDs
         destination_node_input.value = destination_node_id
+        destination_mode_dropdown.visible = len(parse_destination_ids(destination_node_id)) > 1
        
 
 
@@ -697,12 +2745,48 @@ def main(page: ft.Page):
         page.client_storage.set("tcp_ip", tcp_ip)
         page.client_storage.set("ble_device_name", ble_device_name)
         page.client_storage.set("destination_node_id", destination_node_id)
+        page.client_storage.set("destination_mode", destination_mode_dropdown.value)
+        page.client_storage.set("additional_interfaces", additional_interfaces_input.value or "")
+        page.client_storage.set("ready_timeout", ready_timeout_input.value)
+        page.client_storage.set("auto_interval", auto_interval_checkbox.value)
+        page.client_storage.set("duty_cycle", duty_cycle_input.value or "")
+        page.client_storage.set("adaptive_rate", adaptive_rate_checkbox.value)
+        page.client_storage.set("target_utilization", target_utilization_input.value or "")
         page.client_storage.set("visible_message", message_text_input.value or "")
         page.client_storage.set("send_visible_message", visible_message_checkbox.value)
         settings_saved = True
         page.overlay.append(ft.SnackBar(ft.Text("Settings saved! Make sure the BLE/TCP node is not connected to any other device before you start the test! "), open=True))
         page.update()
 
+        # The radios are connected right away, a running test keeps its radios
+        if not test_running:
+            threading.Thread(target=preconnect, name="preconnect", daemon=True).start()
+
+    # Connects the radios in the background and waits for their node DB, so the
+    # test starts on interfaces that are already ready
+    def preconnect():
+        if not connect_to_device():
+            return
+        ready_timeout = int(ready_timeout_input.value) if ready_timeout_input.value.isdigit() else CONNECTION_READY_TIMEOUT
+        # A test start or a newer warm-up with other radios takes over
+        sessions = list(session_manager.sessions)
+        superseded = lambda: test_running or session_manager.sessions != sessions
+        ready = session_manager.wait_ready(ready_timeout, superseded)
+        if superseded():
+            return
+        errors = [session.connect_error for session in sessions if session.connect_error is not None]
+        if ready:
+            connection_status_icon.color = "green"
+            connection_status_text.value = "Ready"
+        elif errors:
+            # Start connects again
+            close_connection()
+            connection_status_text.value = f"Connection error: {errors[0]}"
+        else:
+            connection_status_icon.color = "yellow"
+            connection_status_text.value = "Connected, waiting for node DB..."
+        page.update()
+
 
 
     def load_settings():
@@ -740,6 +2824,13 @@ def main(page: ft.Page):
         tcp_ip_value = page.client_storage.get("tcp_ip") or ""
         ble_device_name_value = page.client_storage.get("ble_device_name") or ""
         destination_node_id_value = page.client_storage.get("destination_node_id") or ""
+        destination_mode_value = page.client_storage.get("destination_mode") or DESTINATION_MODES[0]
+        additional_interfaces_value = page.client_storage.get("additional_interfaces") or ""
+        ready_timeout_value = page.client_storage.get("ready_timeout") or str(CONNECTION_READY_TIMEOUT)
+        auto_interval_value = page.client_storage.get("auto_interval") or False
+        duty_cycle_value = page.client_storage.get("duty_cycle") or ""
+        adaptive_rate_value = page.client_storage.get("adaptive_rate") or False
+        target_utilization_value = page.client_storage.get("target_utilization") or str(CHANNEL_UTILIZATION_TARGET)
         visible_message_value = page.client_storage.get("visible_message") or ""
         send_visible_message_value = page.client_storage.get("send_visible_message") or False
 
@@ -751,6 +2842,13 @@ def main(page: ft.Page):
         tcp_ip_input.value = tcp_ip_value
         ble_device_input.value = ble_device_name_value
         destination_node_input.value = destination_node_id_value
+        destination_mode_dropdown.value = destination_mode_value if destination_mode_value in DESTINATION_MODES else DESTINATION_MODES[0]
+        additional_interfaces_input.value = additional_interfaces_value
+        ready_timeout_input.value = ready_timeout_value
+        auto_interval_checkbox.value = auto_interval_value
+        duty_cycle_input.value = duty_cycle_value
+        adaptive_rate_checkbox.value = adaptive_rate_value
+        target_utilization_input.value = target_utilization_value
         message_text_input.value = visible_message_value
         visible_message_checkbox.value = send_visible_message_value
 
@@ -758,6 +2856,7 @@ def main(page: ft.Page):
         tcp_ip_input.visible = connection_type_value == "TCP"
         ble_device_input.visible = connection_type_value == "BLE"
         message_text_input.visible = send_visible_message_value
+        destination_mode_dropdown.visible = len(parse_destination_ids(destination_node_id_value)) > 1
 
         # Enable Save button when all required fields are filled
         save_button.disabled = not (
@@ -772,43 +2871,73 @@ def main(page: ft.Page):
 
 
 
+    # Connects the interface from the settings and the additional A/B test
+    # interfaces, each bound to its antenna
     def connect_to_device():
-        global interface
-        try:
-            connection_status_icon.color = "yellow"
-            connection_status_text.value = "Setting up connection..."
-            page.update()
-
-            connection_type = connection_type_dropdown.value
-            tcp_ip = tcp_ip_input.value
-            ble_device_name = ble_device_input.value
-
-            if connection_type == "TCP":
-                interface = meshtastic.tcp_interface.TCPInterface(hostname=tcp_ip)
-            elif connection_type == "BLE":
-                interface = meshtastic.ble_interface.BLEInterface(ble_device_name)
-
-            pub.subscribe(on_receive, "meshtastic.receive")
-            #print(f"Connected via {connection_type}")
-            return True
-        except Exception as ex:
-            connection_status_icon.color = "red"
-            connection_status_text.value = f"Connection error: {str(ex)}"
+        # Waits for a warm-up that is still connecting and then reuses its sessions
+        with connection_lock:
+            try:
+                connection_type = connection_type_dropdown.value
+                address = tcp_ip_input.value if connection_type == "TCP" else ble_device_input.value
+                sessions = [ProbeSession(antenna_name_input.value, connection_type, address, url_input.value or "", notes_input.value or "")]
+                sessions += [ProbeSession(*spec) for spec in parse_interface_specs(additional_interfaces_input.value)]
+
+                # The connections stay open between tests and are only reopened
+                # when the radios in the settings change
+                if not session_manager.reuse(sessions):
+                    connection_status_icon.color = "yellow"
+                    connection_status_text.value = "Setting up connection..."
+                    page.update()
+                    ready_timeout = int(ready_timeout_input.value) if ready_timeout_input.value.isdigit() else CONNECTION_READY_TIMEOUT
+                    session_manager.open(sessions, on_receive, on_connection_lost, ready_timeout)
+                #print(f"Connected via {connection_type}")
+                return True
+            except Exception as ex:
+                connection_status_icon.color = "red"
+                connection_status_text.value = f"Connection error: {str(ex)}"
+                page.update()
+                return False
+
+
+    # Called from the meshtastic reader thread when a radio drops its connection.
+    # A running test is paused while the radio is reconnected in the background.
+    def on_connection_lost(session):
+        global paused_for_reconnect
+        connection_status_icon.color = "orange"
+        connection_status_text.value = f"Connection to {session.antenna_name} lost, reconnecting..."
+        if test_running and test_scheduler is not None and not test_scheduler.paused:
+            test_scheduler.pause()
+            paused_for_reconnect = True
+            countdown_label.value = "Paused until the radio is reconnected"
+        page.update()
+        ready_timeout = int(ready_timeout_input.value) if ready_timeout_input.value.isdigit() else CONNECTION_READY_TIMEOUT
+        session_manager.reconnect(session, ready_timeout, on_reconnect_attempt)
+
+    # Resumes the schedule once all radios are connected again
+    def on_reconnect_attempt(session, attempt, error):
+        global paused_for_reconnect
+        if error is not None:
+            connection_status_text.value = f"Connection to {session.antenna_name} lost, reconnect attempt {attempt} failed: {error}"
             page.update()
-            return False
-
+            return
 
-    # Queue for ACK processing directly within the existing flow
-    def process_ack_queue():
-        while not ack_queue.empty():
-            ack_data = ack_queue.get()
+        if any(s.lost for s in session_manager.sessions):
+            return
+        connection_status_icon.color = "green"
+        connection_status_text.value = "Connected"
+        if paused_for_reconnect:
+            paused_for_reconnect = False
+            if test_scheduler is not None and not test_scheduler.stopped:
+                test_scheduler.resume()
+        page.overlay.append(ft.SnackBar(ft.Text(f"Reconnected to {session.antenna_name}."), open=True))
+        page.update()
 
-            # Insert into the database
+    # Storage stage of the ACK pipeline, runs on its own thread
+    def store_acks(batch):
+        for ack_data in batch:
+            # Add to the insert batch, which is committed in groups
             try:
-                query = '''
-                    INSERT INTO results (antenna_name, url, notes, location, node_name, node_id, connection_type, address, timestamp, rssi, snr)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                '''
+                record_probe(ack_data['probe'], "acked", ack_data['rtt_ms'])
                 params = (
                     ack_data['antenna_name'],
                     ack_data['url'],
@@ -816,24 +2945,39 @@ def main(page: ft.Page):
                     ack_data['location'],
                     "Unknown Node",
                     ack_data['from_id'],
-                    connection_type_dropdown.value,
-                    tcp_ip_input.value if connection_type_dropdown.value == "TCP" else ble_device_input.value,
-                    datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                    ack_data['connection_type'],
+                    ack_data['address'],
+                    ack_data['timestamp'],
                     ack_data['rssi'],
-                    ack_data['snr']
+                    ack_data['snr'],
+                    ack_data['rtt_ms'],
+                    ack_data['channel_utilization'],
+                    ack_data['air_util_tx'],
+                    ack_data['probe_interval']
                 )
-                database_manager(query, params, commit=True)
+                ack_batcher.add(params)
+                rtt_histograms.add(ack_data['antenna_name'], ack_data['location'], ack_data['from_id'], ack_data['rtt_ms'])
                 #print("Data inserted successfully:", ack_data)
-                page.overlay.append(ft.SnackBar(ft.Text(f"ACK received and logged"), open=True))
             except Exception as e:
                 print(f"Error while inserting into database: {e}")
                 page.overlay.append(ft.SnackBar(ft.Text(f"Error while inserting data: {e}"), open=True))
 
-        # Update the UI after processing
-        page.update()
-
-    # on_receive remains unchanged, puts the data into the queue
-    def on_receive(packet, interface):
+    # UI stage of the ACK pipeline, one refresh for all ACKs that arrived meanwhile
+    def display_acks(batch):
+        message = "ACK received and logged" if len(batch) == 1 else f"{len(batch)} ACKs received and logged"
+        dropped = ack_pipeline.capture_queue.dropped + ack_pipeline.display_queue.dropped
+        if dropped:
+            peak = max(ack_pipeline.capture_queue.peak, ack_pipeline.display_queue.peak)
+            message += f" ({dropped} dropped, queue full; peak backlog {peak} of {ACK_QUEUE_SIZE})"
+        page.overlay.append(ft.SnackBar(ft.Text(message), open=True))
+        update_message_ack_display()
+
+    ack_pipeline = AckPipeline(store_acks, display_acks)
+
+    # Called by the listener of each session on the meshtastic reader thread;
+    # it only matches the ACK and hands it to the pipeline, so packet reception
+    # never waits for the database or the UI
+    def on_receive(packet, session):
         global acks_received
         from_id = packet.get("fromId", "")
         request_id = packet.get("decoded", {}).get("requestId", None)
@@ -841,24 +2985,31 @@ def main(page: ft.Page):
         rssi = packet.get("rxRssi", None)
         snr = packet.get("rxSnr", None)
 
-        # Check if the ACK was received for the correct message
-        if from_id == destination_node_input.value and request_id == sent_message_id:
-            if request_id is not None:
-                acks_received += 1  # Increment ACK counter
-                ack_data = {
-                    'antenna_name': antenna_name_input.value,
-                    'url': url_input.value,
-                    'notes': notes_input.value,
-                    'location': location_input_dropdown.value if location_input_dropdown.value != "New Location" else new_location_input.value,
-                    'from_id': from_id,
-                    'rssi': rssi,
-                    'snr': snr
-                }
-                ack_queue.put(ack_data)  # Put ACK data into the queue
-                update_message_ack_display()  # Update GUI for received ACKs
-
-                # Process the ACK data immediately upon reception
-                process_ack_queue()
+        # Check if the ACK belongs to one of the probes in flight
+        probe = inflight_probes.match(request_id, from_id) if request_id is not None else None
+        if probe is not None:
+            acks_received += 1  # Increment ACK counter
+            rtt_ms = (time.monotonic() - probe['sent_at']) * 1000
+            ack_data = {
+                'probe': probe,
+                'antenna_name': session.antenna_name,
+                'url': session.url,
+                'notes': session.notes,
+                'connection_type': session.connection_type,
+                'address': session.address,
+                'location': location_input_dropdown.value if location_input_dropdown.value != "New Location" else new_location_input.value,
+                'from_id': from_id,
+                'timestamp': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                'rssi': rssi,
+                'snr': snr,
+                'rtt_ms': rtt_ms,
+                # Channel load and interval of the rate control when the ACK arrived
+                'channel_utilization': rate_controller.channel_utilization if rate_controller else None,
+                'air_util_tx': rate_controller.air_util_tx if rate_controller else None,
+                'probe_interval': rate_controller.interval if rate_controller else None
+            }
+            if not ack_pipeline.put(ack_data):
+                print(f"ACK from {from_id} dropped, the capture queue is full")
 
 
 
@@ -868,7 +3019,7 @@ def main(page: ft.Page):
         delete_database_button.disabled = True
         export_csv_button.disabled = True
         import_db_button.disabled = True  # Import DB button disabled
-        export_db_button.disabled = True  # Export DB button disabled
+        # Export DB stays enabled, the backup reads a consistent snapshot while a test writes
         page.update()
       
 
@@ -892,20 +3043,27 @@ def main(page: ft.Page):
 
 
     def start_sending(e):
-        global stop_sending, messages_sent, acks_received, test_running
-        test_running = True
+        global stop_sending, messages_sent, acks_received, probes_lost, test_running, test_scheduler, paused_for_reconnect
+        # Ignore the button while a test is already running
+        if test_scheduler is not None and not test_scheduler.stopped:
+            return
+
         stop_sending = False
+        paused_for_reconnect = False
         messages_sent = 0  # Reset message counter
         acks_received = 0  # Reset ACK counter
+        probes_lost = 0  # Reset lost probe counter
+        inflight_probes.clear()
+        rtt_histograms.clear()
         update_message_ack_display()  # Set GUI counters to 0
 
         # Reset the display
         messages_sent_value.value = "0"
         acks_received_value.value = "0"
+        probes_lost_value.value = "0"
+        channel_load_value.value = "N/A"
         page.update()
 
-        # Disable data buttons when the test starts
-        disable_data_buttons()
         global settings_saved
 
         if not settings_saved:
@@ -930,65 +3088,150 @@ def main(page: ft.Page):
             page.update()
             return
 
-        destination_node_id = destination_node_input.value
+        destinations = parse_destination_ids(destination_node_input.value)
+        concurrent_destinations = destination_mode_dropdown.value == "Concurrent"
         countdown_label.value = ""
 
-        if interface is None:
-            if not connect_to_device():
-                return
+        if not connect_to_device():
+            return
 
-        # Get the interval from the input field
+        # Set only once the test really starts, the warm-up after saving the
+        # settings is skipped while a test runs
+        test_running = True
+        # Disable data buttons when the test starts
+        disable_data_buttons()
+
+        # Get the interval and the connection timeout from the input fields
         interval = int(interval_input.value) if interval_input.value.isdigit() else 30
+        auto_interval = auto_interval_checkbox.value
+        adaptive_rate = adaptive_rate_checkbox.value
+        target_utilization = float(target_utilization_input.value) if target_utilization_input.value.replace(".", "", 1).isdigit() else CHANNEL_UTILIZATION_TARGET
+        ready_timeout = int(ready_timeout_input.value) if ready_timeout_input.value.isdigit() else CONNECTION_READY_TIMEOUT
+
+        # With several interfaces every antenna is probed once per interval, the
+        # radios take turns in equal steps so their probes do not collide
+        next_sessions = session_manager.interleaved()
+        session_destinations = {session: itertools.cycle(destinations) for session in session_manager.sessions}
+        send_interval = interval / len(session_manager.sessions)
+
+        def prepare_test():
+            global rate_controller
+            progress_bar.visible = True
+            if not wait_for_radios(ready_timeout):
+                return False
+            fastest_interval, air_util_limit = plan_airtime()
+            rate_controller = AimdRateController(
+                test_scheduler.interval * len(session_manager.sessions),
+                min_interval=fastest_interval,
+                target=target_utilization,
+                air_util_limit=air_util_limit,
+                enabled=adaptive_rate,
+            )
+            start_timer()
+            return True
 
-        progress_bar.visible = True
-        simulate_connection_setup(destination_node_id)
+        # Every radio gets an airtime budget from its LoRa settings; with the
+        # automatic interval the test runs at the fastest interval that the
+        # budget of the slowest radio allows.
+        # Returns (fastest_interval, air_util_limit), the limit being the
+        # lowest duty cycle in percent or None if no radio has one.
+        def plan_airtime():
+            payload_bytes = len(message_text_input.value.encode("utf-8")) if visible_message_checkbox.value else 0
+            probes_per_interval = len(destinations) if concurrent_destinations else 1
+            fastest_interval = MIN_PROBE_INTERVAL
+            air_util_limit = None
+            for session in session_manager.sessions:
+                session.probe_airtime = probe_airtime(session.interface, payload_bytes)
+                region = radio_lora_settings(session.interface)[3]
+                duty_cycle = duty_cycle_setting(region) / 100
+                session.airtime_budget = AirtimeBudget(duty_cycle)
+                fastest_interval = max(fastest_interval, plan_probe_interval(session.probe_airtime, probes_per_interval, duty_cycle))
+                if duty_cycle < 1:
+                    air_util_limit = min(air_util_limit or 100, duty_cycle * 100)
+
+            if auto_interval:
+                interval_input.value = str(fastest_interval)
+                test_scheduler.set_interval(fastest_interval / len(session_manager.sessions))
+            elif interval < fastest_interval:
+                page.overlay.append(ft.SnackBar(ft.Text(
+                    f"An interval of {interval} s exceeds the duty cycle, probes over the airtime budget are skipped. "
+                    f"The fastest compliant interval is {fastest_interval} s."), open=True))
+            page.update()
+            return fastest_interval, air_util_limit
+
+        # Feeds the channel load of the busiest radio into the rate control,
+        # called once per second by the scheduler
+        def adapt_rate():
+            readings = [read_device_metrics(session.interface) for session in session_manager.sessions]
+            channel_utilizations = [reading[0] for reading in readings if reading[0] is not None]
+            if rate_controller is None or not channel_utilizations:
+                return
+            air_util_tx = max((reading[1] for reading in readings if reading[1] is not None), default=None)
+            new_interval = rate_controller.update(max(channel_utilizations), air_util_tx)
+            if new_interval is not None:
+                test_scheduler.set_interval(new_interval / len(session_manager.sessions))
+            channel_load_value.value = f"{rate_controller.channel_utilization:.1f} % (interval {rate_controller.interval:.0f} s)"
 
-        start_timer()
+        def on_tick(seconds_to_next_send, elapsed_seconds):
+            adapt_rate()
+            update_test_clock(seconds_to_next_send, elapsed_seconds)
 
-        # Main test loop
-        while not stop_sending:
-            # Countdown before sending the next message
-            countdown(interval)
-            if stop_sending:
-                break
-            
-            # Send message
-            send_message(destination_node_id)
-            
-            # Process the ACK queue after each message
-            process_ack_queue()
-            
-            # Update the elapsed time
-            update_elapsed_time()
+        def send_probe():
+            countdown_label.value = "Sending message..."
             page.update()
 
-        # Ensure all ACKs are processed
-        stop_sending_messages(None)
+            # Send a message from the next radio to its next destination, or to
+            # all of them; their ACKs are matched per destination by the in-flight table
+            session = next(next_sessions)
+            if concurrent_destinations:
+                for destination_node_id in destinations:
+                    send_message(destination_node_id, session)
+            else:
+                send_message(next(session_destinations[session]), session)
 
+        # The scheduler owns the send timing on its own thread, so this handler
+        # returns right away and the UI (and the Stop button) stays responsive
+        pause_button.text = "Pause"
+        # Reports an error that ended the test on the scheduler thread
+        def finish_test():
+            if scheduler.error is not None:
+                stop_sending_messages(None, f"Test stopped by an error: {scheduler.error}")
 
+        scheduler = TestScheduler(send_interval, send_probe, on_tick=on_tick, on_prepare=prepare_test, on_finish=finish_test)
+        test_scheduler = scheduler
+        test_scheduler.start()
 
 
 
 
-    def stop_sending_messages(e):
-        global stop_sending, interface, test_running
+
+
+    def stop_sending_messages(e, message="Test stopped by user."):
+        global stop_sending, test_running, paused_for_reconnect
         test_running = False
+        paused_for_reconnect = False
         stop_sending = True
+        if test_scheduler is not None:
+            test_scheduler.stop()
+            # Let a probe that is being sent right now finish before the interface is closed
+            if threading.current_thread() is not test_scheduler.thread:
+                test_scheduler.thread.join(timeout=5)
         progress_bar.visible = False
         countdown_label.value = ""
         test_start_time = None
         elapsed_time_label.value = "Elapsed Time: 00:00:00"
 
-        if interface is not None:
-            try:
-                interface.close()
-                interface = None
-                connection_status_icon.color = "red"
-                connection_status_text.value = "No connection"
-            except Exception as ex:
-                page.overlay.append(ft.SnackBar(ft.Text(f"Error: {str(ex)}"), open=True))
-
-        page.overlay.append(ft.SnackBar(ft.Text("Test stopped by user."), open=True))
+        # Commit all ACKs still waiting in the pipeline and the insert batch
+        ack_pipeline.drain()
+        if not ack_batcher.flush():
+            page.overlay.append(ft.SnackBar(ft.Text("Error while saving the last ACKs to the database."), open=True))
+        rtt_histograms.flush()
+        # Probes still in flight have no outcome yet and are not stored
+        if not probe_batcher.flush():
+            page.overlay.append(ft.SnackBar(ft.Text("Error while saving the probe results to the database."), open=True))
+
+        # The connections stay open for the next test
+        page.overlay.append(ft.SnackBar(ft.Text(message), open=True))
         enable_data_buttons()
         page.update()
 
@@ -996,47 +3239,59 @@ def main(page: ft.Page):
 
 
 
-    def simulate_connection_setup(destination_node_id):
-        global messages_sent
-        progress_bar.value = 0
-        for i in range(1, 31):
-            if stop_sending:
-                stop_sending_messages(None)
-                return
-            progress_bar.value = i / 30
-            connection_status_text.value = f"Setting up connection... {i * 100 // 30}%"
-            page.update()
-            time.sleep(1)
-
-        if not stop_sending:
-            connection_status_icon.color = "green"
-            connection_status_text.value = "Connected"
+    # Runs on the scheduler thread before the first probe and returns as soon
+    # as all radios are connected and have their node DB. Returns False if the
+    # test was stopped, or cancels it if the radios are not ready within timeout.
+    def wait_for_radios(timeout):
+        def on_progress(ready_sessions, session_count):
+            progress_bar.value = ready_sessions / session_count
+            connection_status_text.value = f"Waiting for radio... {ready_sessions}/{session_count} ready"
             page.update()
 
-            send_message(destination_node_id)
-
+        if not session_manager.wait_ready(timeout, lambda: test_scheduler.stopped, on_progress):
+            if not test_scheduler.stopped:
+                errors = [session.connect_error for session in session_manager.sessions if session.connect_error is not None]
+                if errors:
+                    stop_sending_messages(None, f"Connection error: {errors[0]}, test cancelled.")
+                else:
+                    stop_sending_messages(None, f"Radio not ready within {timeout} seconds, test cancelled.")
+                close_connection()
+            return False
 
+        connection_status_icon.color = "green"
+        connection_status_text.value = "Connected"
         progress_bar.visible = False
         page.update()
+        return True
 
 
+    # Closes all radio connections, the next test connects again
+    def close_connection():
+        errors = session_manager.close()
+        connection_status_icon.color = "red"
+        connection_status_text.value = "No connection"
+        for ex in errors:
+            page.overlay.append(ft.SnackBar(ft.Text(f"Error: {str(ex)}"), open=True))
+        page.update()
 
-    def countdown(seconds):
-        for i in range(seconds, 0, -1):
-            if stop_sending:
-                break
-            countdown_text = f"Next message in {i} seconds..."
-            countdown_label.value = countdown_text
-            update_elapsed_time()
-            page.update()
-            time.sleep(1)  # Simulates the countdown wait time
-        if not stop_sending:
-            countdown_label.value = "Sending message..."
-            page.update()
+    def toggle_pause(e):
+        global paused_for_reconnect
+        if test_scheduler is None or test_scheduler.stopped:
+            return
+        if test_scheduler.paused and not paused_for_reconnect:
+            test_scheduler.resume()
+            pause_button.text = "Pause"
+        else:
+            # A pause by the user outlasts a reconnect
+            paused_for_reconnect = False
+            test_scheduler.pause()
+            pause_button.text = "Resume"
+            countdown_label.value = "Paused"
+        page.update()
 
 
 
-    def on_column_click(column_name, tab_index):
+    async def on_column_click(column_name, tab_index):
         global sort_column, sort_descending
 
         # If the same column is clicked, toggle the sort order
@@ -1050,9 +3305,9 @@ def main(page: ft.Page):
 
         # Reload the appropriate table based on the tab index
         if tab_index == 2:  # Antennas table
-            load_results(location_filter_dropdown.value)
+            await load_results(location_filter_dropdown.value)
         elif tab_index == 3:  # Locations table
-            load_locations(sort_by=sort_column)
+            await load_locations(sort_by=sort_column)
 
         # Update the page to display the sorting
         page.update()
@@ -1064,18 +3319,22 @@ def main(page: ft.Page):
 
 
 
-    def on_location_filter_change(e):
+    async def on_location_filter_change(e):
         selected_location = location_filter_dropdown.value
-        load_results(selected_location)
+        await load_results(selected_location)
         page.update()
 
-    def on_location_dropdown_change(e):
+    async def on_destination_filter_change(e):
+        await load_results(location_filter_dropdown.value)
+        page.update()
+
+    async def on_location_dropdown_change(e):
         selected_location = e.control.value
 
         if selected_location == "All Locations":
-            load_locations()
+            await load_locations()
         else:
-            load_locations(selected_location)
+            await load_locations(selected_location)
 
 
 
@@ -1138,6 +3397,8 @@ def main(page: ft.Page):
             if antenna_to_delete:
                 query = "DELETE FROM results WHERE antenna_name = ?"
                 database_manager(query, (antenna_to_delete,), commit=True)
+                database_manager("DELETE FROM rtt_histograms WHERE antenna_name = ?", (antenna_to_delete,), commit=True)
+                database_manager("DELETE FROM probes WHERE antenna_name = ?", (antenna_to_delete,), commit=True)
                 load_data_tab()
                 load_settings()
                 page.overlay.append(ft.SnackBar(ft.Text("Antenna deleted."), open=True))
@@ -1164,6 +3425,8 @@ def main(page: ft.Page):
             if location_to_delete:
                 query = "DELETE FROM results WHERE location = ?"
                 database_manager(query, (location_to_delete,), commit=True)
+                database_manager("DELETE FROM rtt_histograms WHERE location = ?", (location_to_delete,), commit=True)
+                database_manager("DELETE FROM probes WHERE location = ?", (location_to_delete,), commit=True)
                 load_data_tab()
                 load_settings()
                 page.overlay.append(ft.SnackBar(ft.Text("Location deleted."), open=True))
@@ -1187,11 +3450,14 @@ def main(page: ft.Page):
         def perform_deletion():
             try:
                 # Safely close all open connections
-                database_manager("VACUUM")  # SQLite specific: Empties the DB, closes, and cleans up
+                storage_engine.close()
 
-                # Now delete
+                # Now delete, including the WAL side files
                 if os.path.exists(DATABASE_FILEPATH):
                     os.remove(DATABASE_FILEPATH)
+                    for suffix in ("-wal", "-shm"):
+                        if os.path.exists(DATABASE_FILEPATH + suffix):
+                            os.remove(DATABASE_FILEPATH + suffix)
                     page.overlay.append(ft.SnackBar(ft.Text("Database deleted successfully."), open=True))
                     update_ui_after_db_change()
                     show_restart_popup(page)
@@ -1230,12 +3496,25 @@ def main(page: ft.Page):
             page.overlay.append(ft.SnackBar(ft.Text("No database available."), open=True))
             return
 
+        # Shows the export progress, the page is only updated when the percentage changes
+        last_percent = None
+
+        def on_progress(copied, total):
+            nonlocal last_percent
+            percent = copied * 100 // total if total else 100
+            if percent != last_percent:
+                last_percent = percent
+                export_status_label.value = f"Exporting DB... {percent}%"
+                page.update()
+
         try:
-            # Export the database to the specified path
+            export_status_label.value = "Exporting DB..."
+            export_status_label.visible = True
+            page.update()
+
+            # Export a consistent snapshot of the database to the specified path
             exported_db_file = os.path.join(CSV_EXPORT_PATH, f"{os.path.splitext(DATABASE_FILENAME)[0]}_{timestamp}.db")
-            with open(DATABASE_FILEPATH, "rb") as db_source:
-                with open(exported_db_file, "wb") as db_dest:
-                    db_dest.write(db_source.read())
+            backup_database(exported_db_file, compact=compact_export_checkbox.value, progress=on_progress)
 
             # Show success message
             if platform.system() == "Linux" and "ANDROID_STORAGE" in os.environ:
@@ -1262,42 +3541,88 @@ def main(page: ft.Page):
         except Exception as ex:
             page.overlay.append(ft.SnackBar(ft.Text(f"Error during DB export: {str(ex)}"), open=True))
 
+        export_status_label.visible = False
         page.update()
 
 
     def import_database(filepath):
         try:
-            database_manager("DELETE FROM results", commit=True)
+            mode = "merge" if merge_import_checkbox.value else "replace"
+            imported_rows = import_results_database(filepath, mode)
+
+            # Show success message
+            page.overlay.append(ft.SnackBar(ft.Text(f"Database imported successfully! ({imported_rows} rows)"), open=True))
+            page.update()
 
-            import_conn = sqlite3.connect(filepath)
-            import_cursor = import_conn.cursor()
+        except Exception as ex:
+            page.overlay.append(ft.SnackBar(ft.Text(f"Error during DB import: {str(ex)}"), open=True))
+            page.update()
 
-            import_cursor.execute("SELECT * FROM results")
-            rows = import_cursor.fetchall()
-            for row in rows:
-                query = '''INSERT INTO results (id, antenna_name, url, notes, location, node_name, node_id, connection_type, address, timestamp, rssi, snr)
-                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)'''
-                database_manager(query, row, commit=True)
 
-            import_conn.close()
+    # Merges several .db/.csv files (e.g. from different field testers) into the database
+    def merge_files(filepaths):
+        def on_progress(files_done, file_count):
+            export_status_label.value = f"Merging files... {files_done}/{file_count}"
+            page.update()
 
-            # Show success message
-            page.overlay.append(ft.SnackBar(ft.Text("Database imported successfully!"), open=True))
+        try:
+            export_status_label.value = f"Merging files... 0/{len(filepaths)}"
+            export_status_label.visible = True
             page.update()
 
+            imported_rows = merge_sample_files(filepaths, progress=on_progress)
+            page.overlay.append(ft.SnackBar(ft.Text(f"{len(filepaths)} files merged, {imported_rows} new rows imported."), open=True))
+
         except Exception as ex:
-            page.overlay.append(ft.SnackBar(ft.Text(f"Error during DB import: {str(ex)}"), open=True))
+            page.overlay.append(ft.SnackBar(ft.Text(f"Error during merge: {str(ex)}"), open=True))
+
+        export_status_label.visible = False
+        page.update()
+
+
+    def import_csv(filepath):
+        def on_progress(imported_rows, rows_per_second):
+            export_status_label.value = f"Importing CSV... {imported_rows} rows ({rows_per_second:.0f} rows/s)"
             page.update()
 
+        try:
+            export_status_label.value = "Importing CSV..."
+            export_status_label.visible = True
+            page.update()
+
+            mode = "merge" if merge_import_checkbox.value else "replace"
+            imported_rows, skipped_rows, rows_per_second = import_results_csv(filepath, mode, progress=on_progress)
+
+            message = f"CSV imported successfully! ({imported_rows} rows, {rows_per_second:.0f} rows/s)"
+            if skipped_rows:
+                message += f" {skipped_rows} invalid rows skipped."
+            page.overlay.append(ft.SnackBar(ft.Text(message), open=True))
+
+        except Exception as ex:
+            page.overlay.append(ft.SnackBar(ft.Text(f"Error during CSV import: {str(ex)}"), open=True))
+
+        export_status_label.visible = False
+        page.update()
+
+
+    # A single .db or .csv file is imported (replace or merge), several files are merged
+    def import_files(filepaths):
+        if len(filepaths) > 1:
+            merge_files(filepaths)
+        elif filepaths[0].lower().endswith((".csv", ".csv.gz")):
+            import_csv(filepaths[0])
+        else:
+            import_database(filepaths[0])
+
 
     def import_db(e):
         if platform.system() == "Windows":
             # Windows: Use FilePicker as before
             def on_file_picked(result: ft.FilePickerResultEvent):
                 if result.files is not None and len(result.files) > 0:
-                    selected_file = result.files[0].path
+                    selected_files = [file.path for file in result.files]
                     try:
-                        import_database(selected_file)
+                        import_files(selected_files)
                     except Exception as ex:
                         page.overlay.append(ft.SnackBar(ft.Text(f"Error during DB import: {str(ex)}"), open=True))
                         page.update()
@@ -1308,20 +3633,21 @@ def main(page: ft.Page):
                 page.update()
 
             page.file_picker.pick_files(
-                allowed_extensions=["db"],
-                dialog_title="Select Database to Import",
+                allowed_extensions=["db", "csv", "gz"],
+                allow_multiple=True,
+                dialog_title="Select Databases or CSV Files to Import",
                 initial_directory=CSV_EXPORT_PATH
             )
         else:
-            # Android: Scan known directory for .db files
+            # Android: Scan known directory for .db and .csv files
             CSV_IMPORT_PATH = "/storage/emulated/0/Download"
             if not os.access(CSV_IMPORT_PATH, os.R_OK):
                 show_permission_dialog()
                 return
         
-            db_files = [f for f in os.listdir(CSV_IMPORT_PATH) if f.endswith('.db')]
+            db_files = [f for f in os.listdir(CSV_IMPORT_PATH) if f.endswith(('.db', '.csv', '.csv.gz'))]
             if not db_files:
-                page.overlay.append(ft.SnackBar(ft.Text("No database files found in the Download folder."), open=True))
+                page.overlay.append(ft.SnackBar(ft.Text("No database or CSV files found in the Download folder."), open=True))
                 page.update()
                 return
 
@@ -1335,8 +3661,8 @@ def main(page: ft.Page):
                 selected_file = db_dropdown.value
                 if selected_file:
                     try:
-                        import_database(os.path.join(CSV_IMPORT_PATH, selected_file))
                         popup.open = False  # Close the dialog after selection
+                        import_files([os.path.join(CSV_IMPORT_PATH, selected_file)])
                         page.update()
                     except Exception as ex:
                         page.overlay.append(ft.SnackBar(ft.Text(f"Error during DB import: {str(ex)}"), open=True))
@@ -1345,11 +3671,17 @@ def main(page: ft.Page):
                     page.overlay.append(ft.SnackBar(ft.Text("Please select a database file to import."), open=True))
                     page.update()
 
+            def on_merge_all(ev):
+                popup.open = False
+                page.update()
+                merge_files([os.path.join(CSV_IMPORT_PATH, f) for f in db_files])
+
             def on_cancel(ev):
                 popup.open = False  # Close the dialog without importing
                 page.update()
 
             import_button = ft.ElevatedButton(text="Import", on_click=on_db_selected)
+            merge_all_button = ft.ElevatedButton(text="Merge All", on_click=on_merge_all)
             cancel_button = ft.ElevatedButton(text="Cancel", on_click=on_cancel)
 
             popup = ft.AlertDialog(
@@ -1358,7 +3690,7 @@ def main(page: ft.Page):
                 content=ft.Column(
                     controls=[
                         db_dropdown,
-                        ft.Row([import_button, cancel_button], alignment="center")
+                        ft.Row([import_button, merge_all_button, cancel_button], alignment="center", wrap=True)
                     ]
                 ),
                 actions=[],
@@ -1379,22 +3711,31 @@ def main(page: ft.Page):
             page.overlay.append(ft.SnackBar(ft.Text("No database available."), open=True))
             return
 
+        # Shows the export progress, the page is only updated when the percentage changes
+        last_percent = None
+
+        def on_progress(written, total):
+            nonlocal last_percent
+            percent = written * 100 // total if total else 100
+            if percent != last_percent:
+                last_percent = percent
+                export_status_label.value = f"Exporting CSV... {percent}% ({written} rows)"
+                page.update()
+
         try:
-            # Query all results
-            rows = database_manager("SELECT * FROM results", fetchall=True)
-            headers = ["id", "antenna_name", "url", "notes", "location", "node_name", "node_id", "connection_type", "address", "timestamp", "rssi", "snr"]
+            export_file = EXPORT_CSV_FILE + ".gz" if compress_csv_checkbox.value else EXPORT_CSV_FILE
+            export_status_label.value = "Exporting CSV..."
+            export_status_label.visible = True
+            page.update()
 
-            # Write CSV file
-            with open(EXPORT_CSV_FILE, "w") as f:
-                f.write(",".join(headers) + "\n")
-                for row in rows:
-                    f.write(",".join(map(str, row)) + "\n")
+            # Stream all results into the CSV file
+            export_results_csv(export_file, compress=compress_csv_checkbox.value, progress=on_progress)
 
             # Show success message
             if platform.system() == "Linux" and "ANDROID_STORAGE" in os.environ:
                 page.overlay.append(
                     ft.SnackBar(
-                        content=ft.Text(f"CSV exported to {EXPORT_CSV_FILE}"),
+                        content=ft.Text(f"CSV exported to {export_file}"),
                         action="OK",
                         on_action=lambda e: page.overlay.clear(),
                         action_color="green",
@@ -1404,9 +3745,9 @@ def main(page: ft.Page):
             else:
                 page.overlay.append(
                     ft.SnackBar(
-                        content=ft.Text(f"CSV exported to {EXPORT_CSV_FILE}"),
+                        content=ft.Text(f"CSV exported to {export_file}"),
                         action="Open",
-                        on_action=lambda e: open_exported_file(page, EXPORT_CSV_FILE),
+                        on_action=lambda e: open_exported_file(page, export_file),
                         action_color="green",
                         open=True,
                     )
@@ -1415,6 +3756,7 @@ def main(page: ft.Page):
         except Exception as ex:
             page.overlay.append(ft.SnackBar(ft.Text(f"Error during CSV export: {str(ex)}"), open=True))
 
+        export_status_label.visible = False
         page.update()
 
 
@@ -1448,20 +3790,62 @@ def main(page: ft.Page):
         on_blur=lambda e: validate_interval(e.control),
     )
 
+    ready_timeout_input = ft.TextField(
+        label="Connection Timeout (seconds)",
+        width=300,
+        value=str(CONNECTION_READY_TIMEOUT),
+        on_change=on_setting_change,
+        on_blur=lambda e: validate_ready_timeout(e.control),
+    )
+
+    # The radio needs at least a few seconds to send its node DB
+    def validate_ready_timeout(field):
+        if not field.value.isdigit() or int(field.value) < 5:
+            field.value = str(CONNECTION_READY_TIMEOUT)
+        page.update()
+
     def validate_interval(field):
         try:
             interval = int(field.value)
-            if interval < 30:
-                field.value = "30"
+            if interval < MIN_PROBE_INTERVAL:
+                field.value = str(MIN_PROBE_INTERVAL)
             page.update()
         except ValueError:
             field.value = "30"
             page.update()
 
+    # Picks the fastest interval the airtime budget allows when the test starts
+    auto_interval_checkbox = ft.Checkbox(label="Automatic Interval (airtime budget)", value=False, on_change=on_setting_change)
+    # AIMD rate control from the channel utilization the radio reports
+    adaptive_rate_checkbox = ft.Checkbox(label="Adapt Interval to Channel Load", value=False, on_change=on_setting_change)
+    target_utilization_input = ft.TextField(
+        label="Target Channel Utilization (%)",
+        width=300,
+        value=str(CHANNEL_UTILIZATION_TARGET),
+        on_change=on_setting_change,
+    )
+    duty_cycle_input = ft.TextField(
+        label="Duty Cycle Limit (%)",
+        hint_text="Empty: limit of the radio's region",
+        width=300,
+        on_change=on_setting_change,
+    )
+
+    # Duty-cycle limit in percent: the setting, or the limit of the region
+    def duty_cycle_setting(region):
+        try:
+            value = float(duty_cycle_input.value)
+            if 0 < value <= 100:
+                return value
+        except (TypeError, ValueError):
+            pass
+        return REGION_DUTY_CYCLES.get(region, 100)
+
 
 
-    start_button = ft.ElevatedButton(text="Start", on_click=start_sending, width=140)
-    stop_button = ft.ElevatedButton(text="Stop", on_click=stop_sending_messages, width=140)
+    start_button = ft.ElevatedButton(text="Start", on_click=start_sending, width=100)
+    pause_button = ft.ElevatedButton(text="Pause", on_click=toggle_pause, width=100)
+    stop_button = ft.ElevatedButton(text="Stop", on_click=stop_sending_messages, width=100)
     connection_status_icon = ft.Icon(name="lens", color="red", size=20)
     connection_status_text = ft.Text(value="No connection", text_align="center")
     countdown_label = ft.Text(value="", size=16, text_align="center")
@@ -1472,6 +3856,14 @@ def main(page: ft.Page):
     messages_sent_value = ft.Text(value="0", text_align="center", size=16, weight="bold")
     acks_received_label = ft.Text(value="ACKs received: ", text_align="center", size=16, weight="bold")
     acks_received_value = ft.Text(value="0", text_align="center", size=16, weight="bold")
+    probes_lost_label = ft.Text(value="Probes lost: ", text_align="center", size=16, weight="bold")
+    probes_lost_value = ft.Text(value="0", text_align="center", size=16, weight="bold")
+    pdr_label = ft.Text(value="Delivery ratio: ", text_align="center", size=16, weight="bold")
+    pdr_value = ft.Text(value="N/A", text_align="center", size=16, weight="bold")
+    channel_load_label = ft.Text(value="Channel load: ", text_align="center", size=16, weight="bold")
+    channel_load_value = ft.Text(value="N/A", text_align="center", size=16, weight="bold")
+    rtt_label = ft.Text(value="RTT p50/p90/p99: ", text_align="center", size=16, weight="bold")
+    rtt_value = ft.Text(value="N/A", text_align="center", size=16, weight="bold")
 
     watermark_image = ft.Image(src="assets/icon.png", opacity=0.1, width=200, height=200)
 
@@ -1483,13 +3875,17 @@ def main(page: ft.Page):
                     ft.Container(height=25),
                     ft.Row(controls=[messages_sent_label, messages_sent_value], alignment="center"),
                     ft.Row(controls=[acks_received_label, acks_received_value], alignment="center"),
+                    ft.Row(controls=[probes_lost_label, probes_lost_value], alignment="center"),
+                    ft.Row(controls=[pdr_label, pdr_value], alignment="center"),
+                    ft.Row(controls=[rtt_label, rtt_value], alignment="center"),
+                    ft.Row(controls=[channel_load_label, channel_load_value], alignment="center"),
                     ft.Row(controls=[countdown_label], alignment="center"),
                     ft.Row(controls=[elapsed_time_label], alignment="center"),
                     ft.Container(expand=True),  # Flexible Container to push the lower elements down
                     ft.Row(controls=[connection_status_icon, connection_status_text], alignment="center", spacing=10),
                     ft.Row(controls=[progress_bar], alignment="center"),
                     ft.Container(height=10),
-                    ft.Row(controls=[start_button, stop_button], alignment="center", spacing=10),
+                    ft.Row(controls=[start_button, pause_button, stop_button], alignment="center", spacing=10),
                     ft.Container(height=20),
                 ],
                 alignment="start",
@@ -1575,7 +3971,26 @@ def main(page: ft.Page):
 
     tcp_ip_input = ft.TextField(label="TCP/IP Address", width=300, visible=True, on_change=on_setting_change)
     ble_device_input = ft.TextField(label="BLE Device Name/Address", width=300, visible=False, on_change=on_setting_change)
-    destination_node_input = ft.TextField(label="Destination Node ID", width=300, on_change=on_setting_change)
+    destination_node_input = ft.TextField(label="Destination Node ID(s)", hint_text="!1234abcd, !5678ef01", width=300, on_change=on_setting_change)
+    destination_mode_dropdown = ft.Dropdown(
+        label="Multiple Destinations",
+        options=[ft.dropdown.Option(mode) for mode in DESTINATION_MODES],
+        value=DESTINATION_MODES[0],
+        on_change=on_setting_change,
+        visible=False,
+        width=300,
+    )
+
+    # Further radios for an A/B test, each with its own antenna
+    additional_interfaces_input = ft.TextField(
+        label="Additional Interfaces (A/B test)",
+        hint_text="Antenna name; TCP; 192.168.1.20",
+        multiline=True,
+        min_lines=1,
+        max_lines=4,
+        width=300,
+        on_change=on_setting_change,
+    )
 
     visible_message_checkbox = ft.Checkbox(label="Send Visible Message", on_change=lambda e: [on_visible_message_change(e), on_setting_change(e)])
     message_text_input = ft.TextField(label="Message Text", width=300, visible=False, on_change=on_setting_change)
@@ -1597,7 +4012,14 @@ def main(page: ft.Page):
                 tcp_ip_input,
                 ble_device_input,
                 destination_node_input,
+                destination_mode_dropdown,
+                additional_interfaces_input,
                 interval_input,  # The interval field
+                auto_interval_checkbox,
+                duty_cycle_input,
+                adaptive_rate_checkbox,
+                target_utilization_input,
+                ready_timeout_input,
                 visible_message_checkbox,
                 message_text_input,
                 save_button,
@@ -1622,6 +4044,14 @@ def main(page: ft.Page):
         width=300,
     )
 
+    destination_filter_dropdown = ft.Dropdown(
+        label="Filter by Destination",
+        options=[ft.dropdown.Option("All Destinations")],
+        value="All Destinations",
+        on_change=on_destination_filter_change,
+        width=300,
+    )
+
 
 
     score_column = ft.DataColumn(
@@ -1637,7 +4067,7 @@ def main(page: ft.Page):
                     width=100,
                     alignment=ft.alignment.center  # Center the title
                 ),
-                on_sort=lambda _: on_column_click("antenna_name", 2)  # Adjust tab index
+                on_sort=lambda _: page.run_task(on_column_click, "antenna_name", 2)  # Adjust tab index
             ),
             ft.DataColumn(
                 label=ft.Container(
@@ -1645,7 +4075,15 @@ def main(page: ft.Page):
                     width=50,
                     alignment=ft.alignment.center  # Center the title
                 ),
-                on_sort=lambda _: on_column_click("rssi", 2)  # Adjust tab index
+                on_sort=lambda _: page.run_task(on_column_click, "rssi", 2)  # Adjust tab index
+            ),
+            ft.DataColumn(
+                label=ft.Container(
+                    content=ft.Text("PDR", weight="bold", size=13),
+                    width=50,
+                    alignment=ft.alignment.center  # Center the title
+                ),
+                on_sort=lambda _: page.run_task(on_column_click, "pdr", 2)  # Adjust tab index
             ),
             ft.DataColumn(
                 label=ft.Container(
@@ -1653,7 +4091,7 @@ def main(page: ft.Page):
                     width=50,
                     alignment=ft.alignment.center  # Center the title
                 ),
-                on_sort=lambda _: on_column_click("score", 2)  # Adjust tab index
+                on_sort=lambda _: page.run_task(on_column_click, "score", 2)  # Adjust tab index
             )
         ],
         rows=[],
@@ -1668,7 +4106,7 @@ def main(page: ft.Page):
                     width=100,
                     alignment=ft.alignment.center
                 ),
-                on_sort=lambda _: on_column_click("location_name", 3)  # Adjust tab index
+                on_sort=lambda _: page.run_task(on_column_click, "location_name", 3)  # Adjust tab index
             ),
             ft.DataColumn(
                 label=ft.Container(
@@ -1676,7 +4114,15 @@ def main(page: ft.Page):
                     width=60,
                     alignment=ft.alignment.center
                 ),
-                on_sort=lambda _: on_column_click("snr", 3)  # Adjust tab index
+                on_sort=lambda _: page.run_task(on_column_click, "snr", 3)  # Adjust tab index
+            ),
+            ft.DataColumn(
+                label=ft.Container(
+                    content=ft.Text("PDR", weight="bold", size=13),
+                    width=50,
+                    alignment=ft.alignment.center
+                ),
+                on_sort=lambda _: page.run_task(on_column_click, "pdr", 3)  # Adjust tab index
             ),
             ft.DataColumn(
                 label=ft.Container(
@@ -1684,19 +4130,28 @@ def main(page: ft.Page):
                     width=60,
                     alignment=ft.alignment.center
                 ),
-                on_sort=lambda _: on_column_click("score", 3)  # Adjust tab index
+                on_sort=lambda _: page.run_task(on_column_click, "score", 3)  # Adjust tab index
             )
         ],
         rows=[],
         column_spacing=1,
     )
 
+    # Shown while a tab is loading its data in the background
+    antennas_loading_ring = ft.ProgressRing(width=16, height=16, stroke_width=2, visible=False)
+    locations_loading_ring = ft.ProgressRing(width=16, height=16, stroke_width=2, visible=False)
+
     antennas_tab = ft.Container(
         content=ft.Column(
             controls=[
                 ft.Container(height=20),
                 ft.Row(
-                    controls=[location_filter_dropdown],
+                    controls=[location_filter_dropdown, antennas_loading_ring],
+                    alignment="center",
+                    expand=False
+                ),
+                ft.Row(
+                    controls=[destination_filter_dropdown],
                     alignment="center",
                     expand=False
                 ),
@@ -1728,7 +4183,7 @@ def main(page: ft.Page):
                 #    alignment="center",
                 #    expand=False
                 #),
-                ft.Container(height=20),
+                ft.Row(controls=[locations_loading_ring], alignment="center", height=20),
                 ft.Container(
                     content=ft.ListView(
                         controls=[locations_table],
@@ -1778,28 +4233,29 @@ def main(page: ft.Page):
                 ft.Text(
                     "This tab is the core of the application where tests are conducted. You connect to a Meshtastic device (the portable test node) using TCP. "
                     "Messages are sent to a fixed destination node, which should always remain in the same location with the same antenna setup to ensure consistent results. "
-                    "The number of messages sent are displayed in real-time. A countdown timer shows when the next message will be sent. "
-                    "Acknowledgments (ACKs) are not displayed in real-time but are checked periodically, similar to checking messages on a voicemail system. "
-                    "The number of ACKs received is updated after each interval, and the connection status is visualized with an icon (green = connected, red = no connection)."
+                    "The first message is sent as soon as the radio is connected and has loaded its node database; if that takes longer than the Connection Timeout from the Setup tab, the test is cancelled. The number of messages sent are displayed in real-time. A countdown timer shows when the next message will be sent. "
+                    "A running test can be paused and resumed with the 'Pause' button; paused time does not count towards the elapsed time. "
+                    "Acknowledgments (ACKs) are stored in the background and the ACK counter is refreshed as they arrive, several ACKs arriving at once are shown together. "
+                    "Several messages can be waiting for their ACK at the same time; a message without an ACK after 120 seconds is counted under Probes lost. Every message is stored with its outcome, and the delivery ratio of the running test is shown. The ACK round-trip times of the running test are shown as median, 90th and 99th percentile. The radios are connected in the background as soon as the settings are saved, so a test starts right away on a radio that is already ready (green icon). The connection stays open between tests and is only set up again when the radios in the settings change. If a radio loses its connection, the test is paused and the app reconnects in the background, waiting longer after every failed attempt (up to two minutes); once the radio is ready again the test resumes. The connection status is visualized with an icon (green = connected, orange = reconnecting, red = no connection)."
                 ),
                 ft.Container(height=5),
                 ft.Text("Setup Tab:", weight="bold", size=14),
                 ft.Text(
                     "In this tab, you configure the settings for your test. You need to input the 'Antenna Name', 'Buy URL', 'Notes', 'Location', and select the 'Connection Type'. "
                     "If you're using a TCP connection, provide the IP address of your portable test node. The 'Destination Node ID' is critical and should always refer to the fixed, "
-                    "stationary node with a constant antenna setup. Changing the setup of this node requires deleting the database and starting fresh."
+                    "stationary node with a constant antenna setup. Changing the setup of this node requires deleting the database and starting fresh. Several destination nodes can be entered, separated by commas; they are then probed one after another (Round robin) or all in every interval (Concurrent) within the same test. For an A/B comparison, further radios can be listed under Additional Interfaces, one per line as 'antenna name; TCP; address' (or 'BLE; device name'). All radios are connected at the start and take turns sending, so every antenna is probed once per interval under the same conditions. The Interval can be as short as 5 seconds. Every radio keeps to a duty-cycle airtime budget, computed from its LoRa preset and the message size; the limit is taken from the radio's region (e.g. 10 % for EU_868) unless Duty Cycle Limit is set. Messages over the budget are skipped. With Automatic Interval, the test runs at the fastest interval the budget allows. With Adapt Interval to Channel Load, the interval follows the channel utilization the radio reports: while it stays below Target Channel Utilization (and the radio's own airtime below the duty cycle) the probe rate grows by half a probe per minute with every new reading, otherwise the interval doubles. The current load is shown in the Test tab and stored with every result."
                 ),
                 ft.Container(height=5),
                 ft.Text("Antennas Tab:", weight="bold", size=14),
                 ft.Text(
-                    "This tab displays and sorts the results of tested antennas. You can sort by antenna name, average RSSI, or calculated score. "
-                    "Clicking on a row reveals additional information like shop links and notes. The score is based on RSSI values, allowing for easy comparison of antenna performance at specific locations."
+                    "This tab displays and sorts the results of tested antennas. You can sort by antenna name, average RSSI, packet delivery ratio (PDR, the share of sent messages that were acknowledged), or calculated score. "
+                    "Clicking on a row reveals additional information like shop links, notes and the ACK round-trip time (RTT) as median, 90th and 99th percentile. The score is based on RSSI values and, for tests that recorded every sent message, 30 % on the PDR, allowing for easy comparison of antenna performance at specific locations. With Filter by Destination, antennas are scored on the samples of one destination node only."
                 ),
                 ft.Container(height=5),
                 ft.Text("Locations Tab:", weight="bold", size=14),
                 ft.Text(
-                    "In this tab, you can view results for different locations. Similar to the Antennas tab, locations can be sorted by name, average SNR, or calculated score. "
-                    "The best-performing antenna for each location is highlighted based on test results, making it easier to select the optimal setup for each environment."
+                    "In this tab, you can view results for different locations. Similar to the Antennas tab, locations can be sorted by name, average SNR, PDR, or calculated score. "
+                    "The best-performing antenna for each location (highest average RSSI) is highlighted based on test results, making it easier to select the optimal setup for each environment. Clicking on a location also shows the RTT percentiles of all its samples."
                 ),
                 ft.Container(height=5),
                 ft.Text("Data Tab:", weight="bold", size=14),
@@ -1811,14 +4267,22 @@ def main(page: ft.Page):
                 ft.Text("Importing a Database on Android:", weight="bold", size=14),
                 ft.Text(
                     "On Android devices, the file picker is not available. To import a database, place the `.db` file in the `Download` folder of your device. "
-                    "Then, go to the 'Data' tab in the app and tap 'Import DB'. You will see a list of available `.db` files to select from."
+                    "Then, go to the 'Data' tab in the app and tap 'Import DB'. You will see a list of available `.db` files to select from. "
+                    "CSV files created with 'Export to CSV' (also `.csv.gz`) can be imported the same way; importing an exported CSV restores the exported results exactly. A CSV file does not contain the outcomes of the sent messages, so replacing the data with a CSV also clears the stored delivery ratios. "
+                    "By default an import replaces all existing results. Tick 'Merge on import (keep existing data)' to add the imported results to your own instead; "
+                    "results that are already in your database are skipped. "
+                    "To combine datasets from several testers, select several `.db` or exported `.csv` files in the file picker (Windows) or tap 'Merge All' in the import dialog (Android). "
+                    "All files are merged into your database, and samples that are already present are detected by their content and skipped. The message outcomes (delivery ratios) of .db files are merged as well."
                 ),
                 ft.Container(height=5),
                 ft.Text("Exporting Data:", weight="bold", size=14),
                 ft.Text(
                     "When exporting data, the exported CSV or database file is saved to the `Documents` folder on Windows or the `Download` folder on Android. "
                     "On Windows, after exporting, you can open the file or folder directly by clicking 'Open' in the Snackbar. "
-                    "On Android, you will receive a confirmation message, and you can access the exported files using a file manager app."
+                    "On Android, you will receive a confirmation message, and you can access the exported files using a file manager app. "
+                    "Tick 'Compress CSV (gzip)' to write the CSV as a `.csv.gz` file, which is much smaller for large databases. "
+                    "The database export is a consistent snapshot and can be made while a test is running. "
+                    "Tick 'Compact DB export (VACUUM)' to write a compacted copy without unused space."
                 ),
                 ft.Container(height=5),
                 ft.Text("Guide Tab:", weight="bold", size=14),
@@ -1881,10 +4345,13 @@ def main(page: ft.Page):
     delete_location_button = ft.ElevatedButton(text="Delete Location", on_click=delete_location, width=300)
     delete_database_button = ft.ElevatedButton(text="Delete Database", on_click=delete_database, width=300)
     export_csv_button = ft.ElevatedButton(text="Export to CSV", on_click=export_csv, width=300)
+    compress_csv_checkbox = ft.Checkbox(label="Compress CSV (gzip)", value=False)
     db_path_label = ft.Text(value=f"Database Path: {DATABASE_FILEPATH}", size=12, visible=False)
     export_status_label = ft.Text(value="", size=12, visible=False)
     import_db_button = ft.ElevatedButton(text="Import DB", on_click=import_db, width=300)
+    merge_import_checkbox = ft.Checkbox(label="Merge on import (keep existing data)", value=False)
     export_db_button = ft.ElevatedButton(text="Export DB", on_click=export_db, width=300)
+    compact_export_checkbox = ft.Checkbox(label="Compact DB export (VACUUM)", value=False)
 
     data_tab = ft.Container(
         content=ft.Column(
@@ -1896,9 +4363,12 @@ def main(page: ft.Page):
                 ft.Container(expand=True),  # Flexible container that pushes lower elements down
                 delete_database_button,
                 export_csv_button,
+                compress_csv_checkbox,
                 export_status_label,
                 export_db_button,  # New Export DB Button
+                compact_export_checkbox,
                 import_db_button,  # New Import DB Button
+                merge_import_checkbox,
                 ft.Container(padding=ft.Padding(top=20, right=0, bottom=0, left=0)),
             ],
             spacing=10,
@@ -1909,15 +4379,15 @@ def main(page: ft.Page):
         expand=True
     )
 
-    def on_tab_change(e):
+    async def on_tab_change(e):
         selected_index = e.control.selected_index
 
         if selected_index == 1:
             load_settings()
         if selected_index == 2:
-            load_results()
+            await load_results()
         elif selected_index == 3:
-            load_locations()
+            await load_locations()
         elif selected_index == 4:
             #print("Test status: " + str(test_running))
             if test_running:
@@ -1951,4 +4421,10 @@ def main(page: ft.Page):
     page.window.resizable = True
     page.window.expand = True
     page.update()
-ft.app(target=main)
+
+
+# Worker processes of merge_sample_files import this module, they must not start the app
+if __name__ == "__main__":
+    # Lets the spawned workers start from a frozen (packaged) executable
+    multiprocessing.freeze_support()
+    ft.app(target=main)
@@ -0,0 +1,53 @@
+import os
+import tempfile
+import unittest
+
+# The app keeps its database in ~/Documents, the tests use a temporary home
+TEST_HOME = tempfile.mkdtemp()
+os.environ["HOME"] = TEST_HOME
+os.environ["USERPROFILE"] = TEST_HOME
+
+import main
+
+
+# A sample with NULL text fields, one with empty strings and one with every field set
+SAMPLES = [
+    (1, None, None, None, None, None, "!a1b2c3d4", None, None, "2024-05-01 10:00:00", -95, -3.25, None, None, None, None),
+    (2, "Stock", "", "", "Garden", "Unknown Node", "!a1b2c3d4", "TCP", "", "2024-05-01 10:00:30", -88, 2.5, 1520.5, None, None, None),
+    (5, "Yagi", "https://example.com", "7 dBi", "Roof", "Unknown Node", "!a1b2c3d4", "BLE", "Node_1a2b", "2024-05-01 10:01:00", -71, 8.75, 980.25, 12.5, 1.25, 30.0),
+]
+
+
+class CsvRoundTripTest(unittest.TestCase):
+    def setUp(self):
+        main.storage_engine.submit(main.migrate_database).result()
+        main.database_manager("DELETE FROM results", commit=True)
+        main.database_manager(
+            f"INSERT INTO results ({', '.join(main.RESULT_COLUMNS)}) VALUES ({', '.join('?' for _ in main.RESULT_COLUMNS)})",
+            SAMPLES, commit=True, many=True,
+        )
+
+    def read_results(self):
+        return main.database_manager(f"SELECT {', '.join(main.RESULT_COLUMNS)} FROM results ORDER BY id", fetchall=True)
+
+    def round_trip(self, compress):
+        filepath = os.path.join(TEST_HOME, "export.csv.gz" if compress else "export.csv")
+        exported = self.read_results()
+        self.assertEqual(main.export_results_csv(filepath, compress=compress), len(SAMPLES))
+        main.database_manager("DELETE FROM results", commit=True)
+
+        imported_rows, skipped_rows, _ = main.import_results_csv(filepath, "replace")
+        self.assertEqual((imported_rows, skipped_rows), (len(SAMPLES), 0))
+        self.assertEqual(self.read_results(), exported)
+
+    def test_round_trip_keeps_null_and_empty_text(self):
+        self.round_trip(compress=False)
+        self.assertEqual(self.read_results(), SAMPLES)
+
+    def test_round_trip_gzip(self):
+        self.round_trip(compress=True)
+        self.assertEqual(self.read_results(), SAMPLES)
+
+
+if __name__ == "__main__":
+    unittest.main()